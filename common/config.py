@@ -2,15 +2,32 @@ from __future__ import annotations
 
 import os
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 
 from dotenv import load_dotenv
 
 
-def _default_env_file() -> str:
-    # Reuse the Nest backend .env by default, so credentials are not duplicated.
-    repo_root = Path(__file__).resolve().parents[2]
-    return str(repo_root / "iot_monitor_backend" / ".env")
+# Reuse the Nest backend .env by default, so credentials are not duplicated.
+# Resolved once at import: the location never changes for a running process.
+_DEFAULT_ENV_FILE = Path(__file__).resolve().parents[2] / "iot_monitor_backend" / ".env"
+_DEFAULT_ENV_FILE_EXISTS = _DEFAULT_ENV_FILE.is_file()
+
+_TRUTHY: frozenset[str] = frozenset({"true", "1", "yes", "on"})
+
+
+def _as_bool(name: str, default: str = "false") -> bool:
+    return os.getenv(name, default).strip().lower() in _TRUTHY
+
+
+def _load_env_file() -> None:
+    env_file = os.getenv("IOT_ENV_FILE")
+    if env_file is not None:
+        # Explicit override: only this path is stat()'ed; an empty value disables loading.
+        if env_file and Path(env_file).exists():
+            load_dotenv(env_file, override=False)
+    elif _DEFAULT_ENV_FILE_EXISTS:
+        load_dotenv(_DEFAULT_ENV_FILE, override=False)
 
 
 @dataclass(frozen=True)
@@ -32,11 +49,11 @@ class Settings:
     ff_csv_enabled: bool = False
 
 
+@lru_cache(maxsize=1)
 def get_settings() -> Settings:
+    # Built once per process; call get_settings.cache_clear() to re-read the environment.
     # Load env file (if present) but still allow overriding via real environment variables.
-    env_file = os.getenv("IOT_ENV_FILE", _default_env_file())
-    if env_file and Path(env_file).exists():
-        load_dotenv(env_file, override=False)
+    _load_env_file()
 
     db_host = os.getenv("DB_HOST", "localhost")
     db_port = int(os.getenv("DB_PORT", "1434"))
@@ -54,9 +71,9 @@ def get_settings() -> Settings:
     postgres_url = os.getenv("POSTGRES_URL")
     
     # Feature flags for multi-domain ingestion (all default to False)
-    ff_mqtt_multi_domain = os.getenv("FF_MQTT_MULTI_DOMAIN", "false").lower() in ("true", "1", "yes", "on")
-    ff_websocket_enabled = os.getenv("FF_WEBSOCKET_ENABLED", "false").lower() in ("true", "1", "yes", "on")
-    ff_csv_enabled = os.getenv("FF_CSV_ENABLED", "false").lower() in ("true", "1", "yes", "on")
+    ff_mqtt_multi_domain = _as_bool("FF_MQTT_MULTI_DOMAIN")
+    ff_websocket_enabled = _as_bool("FF_WEBSOCKET_ENABLED")
+    ff_csv_enabled = _as_bool("FF_CSV_ENABLED")
 
     return Settings(
         db_host=db_host,
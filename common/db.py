@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from functools import lru_cache
 from typing import Iterator
 import logging
 
@@ -7,12 +8,14 @@ from sqlalchemy import create_engine, text
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session, sessionmaker
 
-from .config import Settings, get_settings
+from .config import Settings, _as_bool, get_settings
 
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=4)
 def build_sqlalchemy_url(settings: Settings) -> str:
+    # Settings is frozen (hashable), so the URL is a pure function of it.
     return (
         f"mssql+pymssql://"
         f"{settings.db_user}:{settings.db_password}"
@@ -40,28 +43,41 @@ def get_engine() -> Engine:
         settings.db_user,
     )
 
-    _engine = create_engine(url, pool_pre_ping=True, pool_recycle=300, future=True)
+    # pool_pre_ping valida cada conexión al hacer checkout; el ping de arranque es opt-in.
+    # query_cache_size: el default (500) se queda corto con todas las sentencias
+    # precompiladas de ingesta/clasificación más sus variantes por dialecto.
+    _engine = create_engine(
+        url,
+        pool_pre_ping=True,
+        pool_recycle=300,
+        future=True,
+        query_cache_size=1200,
+    )
 
-    try:
-        with _engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
-        logger.info("[DB] Test de conexión OK")
-    except Exception:
-        logger.exception("[DB] Test de conexión FALLÓ")
+    if _as_bool("IOT_DB_STARTUP_PING"):
+        try:
+            with _engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            logger.info("[DB] Test de conexión OK")
+        except Exception:
+            logger.exception("[DB] Test de conexión FALLÓ")
 
     return _engine
 
 
-SessionLocal = sessionmaker(
-    bind=get_engine(),
-    autocommit=False,
-    autoflush=False,
-    future=True,
-)
+@lru_cache(maxsize=1)
+def _session_factory() -> sessionmaker:
+    # Lazy: importing this module must not open a connection to SQL Server.
+    return sessionmaker(
+        bind=get_engine(),
+        autocommit=False,
+        autoflush=False,
+        future=True,
+    )
 
 
 def get_db() -> Iterator[Session]:
-    db = SessionLocal()
+    db = _session_factory()()
     try:
         yield db
     finally:
@@ -10,6 +10,7 @@ Los archivos IoT permanecen en su ubicación original intactos.
 
 from __future__ import annotations
 
+import sys
 from datetime import datetime
 from typing import List, Optional
 from uuid import UUID
@@ -23,6 +24,37 @@ from ...core.domain.data_point import DataPoint
 from ...core.domain.series_id import SeriesIdMapper
 
 
+# Claves de metadata y literales compartidos por todos los DataPoints de un
+# paquete: internados una vez para que cada dict reutilice el mismo objeto.
+_K_DEV = sys.intern("device_uuid")
+_K_SEN = sys.intern("sensor_uuid")
+_K_TS = sys.intern("sensor_ts")
+_K_SEQ = sys.intern("sequence")
+_DOMAIN_IOT = sys.intern("iot")
+_UNKNOWN = sys.intern("unknown")
+
+# Longitudes posibles de un isoformat(): "YYYY-MM-DD" .. "...T..:..:..ffffff+HH:MM:SS.ffffff"
+_ISO_MIN_LEN = 10
+_ISO_MAX_LEN = 40
+
+
+def _parse_device_timestamp(value: object) -> Optional[datetime]:
+    """Obtiene device_timestamp de metadata; None si falta o es inválido.
+    
+    Acepta el datetime nativo que guarda reading_to_datapoint o un string
+    ISO (DataPoints llegados por JSON). El chequeo de tipo y longitud
+    descarta la basura sin pasar por el manejo de excepciones.
+    """
+    if isinstance(value, datetime):
+        return value
+    if not isinstance(value, str) or not _ISO_MIN_LEN <= len(value) <= _ISO_MAX_LEN:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
 class IoTAdapter:
     """Adapter bidireccional: Reading ↔ DataPoint.
     
@@ -63,7 +95,8 @@ class IoTAdapter:
                 "device_uuid": reading.device_uuid,
                 "sensor_uuid": reading.sensor_uuid,
                 "sequence": reading.sequence,
-                "device_timestamp": reading.device_timestamp.isoformat() if reading.device_timestamp else None,
+                # Nativo: solo se serializa al cruzar un borde JSON/persistencia
+                "device_timestamp": reading.device_timestamp,
             },
             sequence=reading.sequence,
         )
@@ -95,12 +128,7 @@ class IoTAdapter:
             )
         
         # Extraer device_timestamp de metadata si existe
-        device_timestamp = None
-        if "device_timestamp" in dp.metadata and dp.metadata["device_timestamp"]:
-            try:
-                device_timestamp = datetime.fromisoformat(dp.metadata["device_timestamp"])
-            except (ValueError, TypeError):
-                pass
+        device_timestamp = _parse_device_timestamp(dp.metadata.get("device_timestamp"))
         
         return Reading(
             sensor_id=dp.legacy_sensor_id,
@@ -128,42 +156,48 @@ class IoTAdapter:
             Esa resolución debe hacerse antes de llamar a este método.
             Este método solo crea DataPoints con la información disponible.
         """
-        data_points = []
+        # Hoist de lo que es constante por paquete; sensor_id se resolverá
+        # después en el pipeline.
+        now = packet.ts or datetime.utcnow()
+        dev = str(packet.device_uuid)
+        prefix = f"iot:device:{dev}:sensor:"
+        DP = DataPoint
         
-        for reading_in in packet.readings:
-            # Crear DataPoint con información disponible
-            # sensor_id se resolverá después en el pipeline
-            dp = DataPoint(
-                series_id=f"iot:device:{packet.device_uuid}:sensor:{reading_in.sensor_uuid}",
-                value=float(reading_in.value),
-                timestamp=packet.ts or datetime.utcnow(),
-                domain="iot",
-                source_id=str(packet.device_uuid),
-                stream_id=str(reading_in.sensor_uuid),
-                stream_type="unknown",  # Se resuelve después
+        return [
+            DP(
+                series_id=prefix + (sen := str(r.sensor_uuid)),
+                value=float(r.value),
+                timestamp=now,
+                domain=_DOMAIN_IOT,
+                source_id=dev,
+                stream_id=sen,
+                stream_type=_UNKNOWN,  # Se resuelve después
                 metadata={
-                    "device_uuid": str(packet.device_uuid),
-                    "sensor_uuid": str(reading_in.sensor_uuid),
-                    "sensor_ts": reading_in.sensor_ts,
-                    "sequence": reading_in.sequence,
+                    _K_DEV: dev,
+                    _K_SEN: sen,
+                    _K_TS: r.sensor_ts,
+                    _K_SEQ: r.sequence,
                 },
-                sequence=reading_in.sequence,
+                sequence=r.sequence,
             )
-            data_points.append(dp)
-        
-        return data_points
+            for r in packet.readings
+        ]
     
     @staticmethod
     def enrich_with_sensor_id(dp: DataPoint, sensor_id: int, sensor_type: str = "unknown") -> DataPoint:
         """Enriquece un DataPoint con sensor_id resuelto.
         
+        Contrato: muta ``dp`` in-place y lo devuelve, sin copiar. DataPoint es
+        mutable por diseño (los ``mark_*`` del pipeline también lo mutan) y
+        con slots la asignación es un store directo en el slot.
+        
         Args:
             dp: DataPoint original (puede tener solo UUIDs)
             sensor_id: ID numérico del sensor (resuelto desde UUID)
             sensor_type: Tipo de sensor
             
         Returns:
-            DataPoint enriquecido con legacy_sensor_id y series_id actualizado
+            El mismo DataPoint, con legacy_sensor_id y series_id actualizados
         """
         dp.legacy_sensor_id = sensor_id
         dp.series_id = SeriesIdMapper.iot_sensor_to_series_id(sensor_id)
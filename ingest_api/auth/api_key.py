@@ -5,11 +5,31 @@ SECURITY: En producción, INGEST_API_KEY debe estar configurado.
 
 from __future__ import annotations
 
+import hmac
 import os
 import logging
 
 from fastapi import Header, HTTPException
 
+logger = logging.getLogger(__name__)
+
+# Snapshot (expected_key, is_production) tomado en la primera petición,
+# cuando el .env ya está cargado; reload_api_key_config() lo refresca (tests).
+_api_key_config: tuple[bytes | None, bool] | None = None
+
+
+def reload_api_key_config() -> tuple[bytes | None, bool]:
+    """Relee INGEST_API_KEY / NODE_ENV / ENVIRONMENT del entorno."""
+    global _api_key_config
+    is_production = (
+        os.getenv("NODE_ENV") == "production" or 
+        os.getenv("ENVIRONMENT") == "production"
+    )
+    expected = os.getenv("INGEST_API_KEY")
+    # En bytes para hmac.compare_digest (acepta cualquier carácter del header)
+    _api_key_config = (expected.encode() if expected else None, is_production)
+    return _api_key_config
+
 
 def require_api_key(
     x_api_key: str | None = Header(default=None, alias="X-API-Key")
@@ -19,12 +39,7 @@ def require_api_key(
     SECURITY FIX: En producción, INGEST_API_KEY debe estar configurado.
     En modo desarrollo, permite acceso sin autenticación con warning.
     """
-    logger = logging.getLogger(__name__)
-    expected = os.getenv("INGEST_API_KEY")
-    is_production = (
-        os.getenv("NODE_ENV") == "production" or 
-        os.getenv("ENVIRONMENT") == "production"
-    )
+    expected, is_production = _api_key_config or reload_api_key_config()
     
     if not expected:
         if is_production:
@@ -42,6 +57,6 @@ def require_api_key(
     if not x_api_key:
         raise HTTPException(status_code=401, detail="API key required")
     
-    if x_api_key != expected:
+    if not hmac.compare_digest(x_api_key.encode(), expected):
         logger.warning("Invalid API key attempt from request")
         raise HTTPException(status_code=401, detail="Invalid API key")
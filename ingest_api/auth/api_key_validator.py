@@ -8,6 +8,8 @@ from __future__ import annotations
 
 import hashlib
 import logging
+import time
+from functools import lru_cache
 from typing import Optional
 
 from fastapi import Header, HTTPException, status
@@ -19,10 +21,18 @@ from ..infrastructure.persistence.postgres import get_postgres_engine
 
 logger = logging.getLogger(__name__)
 
+# last_used_at es telemetría: se escribe como máximo una vez por intervalo y key.
+LAST_USED_WRITE_INTERVAL_SECONDS = 60.0
+_last_used_written: dict[str, float] = {}
 
+
+@lru_cache(maxsize=4096)
 def hash_api_key(api_key: str) -> str:
     """Hashea un API key con SHA-256.
     
+    Memoizado: el conjunto de keys activos es pequeño, así que el hash
+    se calcula una sola vez por key y proceso.
+    
     Args:
         api_key: API key en texto plano
         
@@ -32,6 +42,74 @@ def hash_api_key(api_key: str) -> str:
     return hashlib.sha256(api_key.encode()).hexdigest()
 
 
+# Filtra is_active en SQL para usar el índice parcial idx_api_keys_hash_active.
+_SELECT_ACTIVE_API_KEY = text("""
+    SELECT 
+        id::text as key_id,
+        key_prefix,
+        role,
+        allowed_source_id,
+        allowed_domains,
+        is_active
+    FROM api_keys
+    WHERE key_hash = :key_hash AND is_active
+    LIMIT 1
+""")
+
+# Solo en fallo: distinguir key inexistente de key inactivo.
+_SELECT_API_KEY_STATUS = text("""
+    SELECT id::text as key_id, key_prefix
+    FROM api_keys
+    WHERE key_hash = :key_hash
+    LIMIT 1
+""")
+
+# Lectura + last_used_at en una sola sentencia (solo keys activos).
+_TOUCH_API_KEY_RETURNING = text("""
+    UPDATE api_keys
+    SET last_used_at = NOW()
+    WHERE key_hash = :key_hash AND is_active
+    RETURNING
+        id::text as key_id,
+        key_prefix,
+        role,
+        allowed_source_id,
+        allowed_domains,
+        is_active
+""")
+
+
+def _last_used_due(key_hash: str) -> bool:
+    """Indica si toca persistir last_used_at para este key (coalescing)."""
+    last = _last_used_written.get(key_hash)
+    return last is None or time.monotonic() - last >= LAST_USED_WRITE_INTERVAL_SECONDS
+
+
+def _reject_missing_key(conn, params: dict, key_prefix: str) -> None:
+    """Camino raro: distingue key inexistente de key inactivo y rechaza (401)."""
+    existing = conn.execute(_SELECT_API_KEY_STATUS, params).fetchone()
+    if existing is None:
+        # Key no existe - loguear intento fallido
+        logger.warning(
+            "[Auth] Invalid API key attempt - prefix=%s",
+            key_prefix,
+        )
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid API key",
+        )
+    
+    logger.warning(
+        "[Auth] Inactive API key attempt - key_id=%s prefix=%s",
+        existing.key_id,
+        existing.key_prefix,
+    )
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="API key is inactive",
+    )
+
+
 def validate_api_key_from_db(
     api_key: str,
     engine: Optional[Engine] = None,
@@ -62,74 +140,60 @@ def validate_api_key_from_db(
     key_hash = hash_api_key(api_key)
     key_prefix = api_key[:8] if len(api_key) >= 8 else api_key
     
+    params = {"key_hash": key_hash}
+    first_seen = key_hash not in _last_used_written
+    
     try:
-        with engine.begin() as conn:
-            result = conn.execute(
-                text("""
-                    SELECT 
-                        id::text as key_id,
-                        key_prefix,
-                        role,
-                        allowed_source_id,
-                        allowed_domains,
-                        is_active
-                    FROM api_keys
-                    WHERE key_hash = :key_hash
-                    LIMIT 1
-                """),
-                {"key_hash": key_hash}
-            ).fetchone()
-            
-            if result is None:
-                # Key no existe - loguear intento fallido
+        result = None
+        touched = False
+        if _last_used_due(key_hash):
+            # Se registra el intento aunque falle: una réplica de solo lectura
+            # o un lock timeout no se reintenta en cada request
+            _last_used_written[key_hash] = time.monotonic()
+            try:
+                with engine.begin() as conn:
+                    result = conn.execute(_TOUCH_API_KEY_RETURNING, params).fetchone()
+                touched = True
+            except Exception as e:
+                # last_used_at es telemetría: no rechaza un request autenticado
                 logger.warning(
-                    "[Auth] Invalid API key attempt - prefix=%s",
-                    key_prefix,
+                    "[Auth] Could not update last_used_at, validating read-only: %s", e
                 )
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Invalid API key",
-                )
-            
-            # Verificar si está activo
-            if not result.is_active:
-                logger.warning(
-                    "[Auth] Inactive API key attempt - key_id=%s prefix=%s",
-                    result.key_id,
-                    result.key_prefix,
-                )
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="API key is inactive",
-                )
-            
-            # Actualizar last_used_at
-            conn.execute(
-                text("""
-                    UPDATE api_keys
-                    SET last_used_at = NOW()
-                    WHERE id = :key_id::uuid
-                """),
-                {"key_id": result.key_id}
-            )
-            
-            # Construir ApiKeyInfo
-            api_key_info = ApiKeyInfo(
-                key_id=result.key_id,
-                key_prefix=result.key_prefix,
-                role=Role(result.role),
-                allowed_source_id=result.allowed_source_id,
-                allowed_domains=result.allowed_domains or [],
-                is_active=result.is_active,
-            )
-            
+        
+        if not touched or result is None:
+            with engine.connect() as conn:
+                if not touched:
+                    result = conn.execute(_SELECT_ACTIVE_API_KEY, params).fetchone()
+                if result is None:
+                    # Solo keys válidos ocupan lugar en _last_used_written
+                    _last_used_written.pop(key_hash, None)
+                    _reject_missing_key(conn, params, key_prefix)
+        
+        # Construir ApiKeyInfo
+        api_key_info = ApiKeyInfo(
+            key_id=result.key_id,
+            key_prefix=result.key_prefix,
+            role=Role(result.role),
+            allowed_source_id=result.allowed_source_id,
+            allowed_domains=result.allowed_domains or [],
+            is_active=result.is_active,
+        )
+        
+        # INFO solo la primera vez que el proceso ve el key; el resto a DEBUG
+        if first_seen:
             logger.info(
                 "[Auth] API key validated - key_id=%s role=%s",
                 api_key_info.key_id,
                 api_key_info.role.value,
             )
-            
-            return api_key_info
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "[Auth] API key validated - key_id=%s role=%s",
+                api_key_info.key_id,
+                api_key_info.role.value,
+            )
+        
+        return api_key_info
             
     except HTTPException:
         raise
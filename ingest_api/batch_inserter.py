@@ -15,27 +15,171 @@ from __future__ import annotations
 import logging
 import threading
 import time
-from dataclasses import dataclass
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import Callable, List, Optional
+from functools import lru_cache
+from typing import Callable, Deque, Dict, List, Optional, Tuple, Union
 
-from sqlalchemy import text
 from sqlalchemy.engine import Engine
 
 logger = logging.getLogger(__name__)
 
+# Esquema: sensor_readings(sensor_id, value, timestamp, device_timestamp)
+_INSERT_PREFIX = (
+    "INSERT INTO dbo.sensor_readings (sensor_id, value, timestamp, device_timestamp) VALUES "
+)
+_INSERT_COLUMNS = 4
+# SQL Server admite como máximo 2100 parámetros por sentencia; 2000 deja margen.
+_MAX_PARAMS_PER_STATEMENT = 2000
+# Sentencia de una fila para executemany (pyodbc, qmark)
+_INSERT_ONE_ROW_QMARK = _INSERT_PREFIX + "(" + ", ".join(["?"] * _INSERT_COLUMNS) + ")"
+
+
+@lru_cache(maxsize=64)
+def _multi_row_insert_sql(placeholder: str, rows: int) -> str:
+    """SQL del INSERT multi-fila, construido una vez por (paramstyle, filas).
+
+    Los lotes completos siempre tienen el mismo tamaño, así que en régimen
+    estable el flush no vuelve a armar el string. Es solo un ahorro de CPU
+    en Python: pymssql (el driver por defecto) sustituye los parámetros en
+    el cliente, así que SQL Server recibe literales y no reutiliza plan.
+    """
+    row_sql = "(" + ", ".join([placeholder] * _INSERT_COLUMNS) + ")"
+    return _INSERT_PREFIX + ", ".join([row_sql] * rows)
+
+
+# Lectura en buffer pendiente de inserción, como tupla plana en el orden de
+# columnas del INSERT: (sensor_id, value, ingest_timestamp, device_timestamp).
+# Sin objeto wrapper por lectura: el flush pasa las tuplas tal cual al driver.
+# ingest_timestamp es un datetime provisto por el caller o, si no, el
+# time.time_ns() de add(); se convierte a datetime recién en el flush.
+BufferedReading = Tuple[int, float, Union[datetime, int], Optional[datetime]]
+
+_NS_PER_SECOND = 1_000_000_000
+
+
+def _stamp_ingest_timestamps(readings: List[BufferedReading]) -> List[BufferedReading]:
+    """Convierte los ingest_timestamp en ns (int) a datetime UTC."""
+    fromtimestamp = datetime.fromtimestamp
+    utc = timezone.utc
+    return [
+        (r[0], r[1], fromtimestamp(r[2] / _NS_PER_SECOND, utc), r[3])
+        if r[2].__class__ is int else r
+        for r in readings
+    ]
+
+
+def _insert_params(readings: List[BufferedReading]) -> Tuple:
+    """Parámetros posicionales planos del INSERT multi-fila.
 
-@dataclass
-class BufferedReading:
-    """Lectura en buffer pendiente de inserción."""
-    sensor_id: int
-    value: float
-    device_timestamp: Optional[datetime]
-    ingest_timestamp: datetime
+    Aplana y convierte los ingest_timestamp en una sola pasada, sin
+    materializar tuplas intermedias por fila.
+    """
+    fromtimestamp = datetime.fromtimestamp
+    utc = timezone.utc
+    params: list = []
+    extend = params.extend
+    for sensor_id, value, ingest_ts, device_ts in readings:
+        if ingest_ts.__class__ is int:
+            ingest_ts = fromtimestamp(ingest_ts / _NS_PER_SECOND, utc)
+        extend((sensor_id, value, ingest_ts, device_ts))
+    return tuple(params)
+
+
+class _ThreadCounters:
+    """Contadores de un thread productor; solo ese thread los escribe."""
+    __slots__ = ("buffered", "dropped")
+
+    def __init__(self):
+        self.buffered = 0
+        self.dropped = 0
+
+
+class _FlushScheduler:
+    """Un único thread daemon que hace el flush de todos los BatchInserter.
+
+    Cada inserter registrado se flushea al vencer su flush_interval o, antes,
+    cuando su buffer alcanza buffer_size (add() despierta al scheduler). Tras
+    un flush fallido (o que lanzó una excepción), un buffer lleno no se
+    reintenta hasta el siguiente intervalo, para no girar en un loop de errores.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        # inserter -> [próximo flush por tiempo, no reintentar-por-lleno antes de]
+        self._schedule: Dict["BatchInserter", List[float]] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, inserter: "BatchInserter") -> None:
+        with self._cond:
+            now = time.monotonic()
+            self._schedule[inserter] = [now + inserter._flush_interval, now]
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="batch-inserter-flush", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+
+    def unregister(self, inserter: "BatchInserter") -> None:
+        with self._cond:
+            self._schedule.pop(inserter, None)
+            self._cond.notify()
+
+    def wake(self) -> None:
+        with self._cond:
+            self._cond.notify()
+
+    def _due(self, now: float) -> List["BatchInserter"]:
+        """Inserters a flushear ahora (se llama con el lock tomado)."""
+        return [
+            inserter
+            for inserter, (next_due, retry_after) in self._schedule.items()
+            if now >= next_due
+            or (now >= retry_after and len(inserter._buffer) >= inserter._buffer_size)
+        ]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                due = self._due(now)
+                while not due:
+                    timeout = (
+                        min(next_due for next_due, _ in self._schedule.values()) - now
+                        if self._schedule else None
+                    )
+                    self._cond.wait(timeout=timeout)
+                    now = time.monotonic()
+                    due = self._due(now)
+
+            for inserter in due:
+                # El thread es compartido: un flush que lanza no puede
+                # matarlo para el resto de los inserters. Se trata como un
+                # flush fallido (backoff de un intervalo).
+                try:
+                    ok = inserter._do_flush()
+                except Exception:
+                    logger.exception("BatchInserter scheduled flush failed")
+                    ok = False
+                with self._cond:
+                    state = self._schedule.get(inserter)
+                    if state is not None:
+                        now = time.monotonic()
+                        state[0] = now + inserter._flush_interval
+                        state[1] = now if ok else now + inserter._flush_interval
+
+
+_flush_scheduler = _FlushScheduler()
 
 
 class BatchInserter:
-    """Inserter de lecturas en batch con buffer y flush periódico."""
+    """Inserter de lecturas en batch con buffer y flush periódico.
+
+    El flush periódico lo ejecuta el thread compartido de _FlushScheduler,
+    no un thread por instancia.
+    """
 
     DEFAULT_BUFFER_SIZE = 100
     DEFAULT_FLUSH_INTERVAL = 5.0  # segundos
@@ -48,6 +192,8 @@ class BatchInserter:
         flush_interval: float = DEFAULT_FLUSH_INTERVAL,
         max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
         on_flush_callback: Optional[Callable[[int], None]] = None,
+        coalesce: bool = False,
+        flush_workers: int = 1,
     ):
         """Inicializa el batch inserter.
 
@@ -57,31 +203,80 @@ class BatchInserter:
             flush_interval: Intervalo en segundos para flush periódico
             max_batch_size: Máximo de lecturas por batch INSERT
             on_flush_callback: Callback opcional llamado después de cada flush
+            coalesce: Si True, cada flush inserta solo la lectura más reciente
+                de cada sensor del lote (no usar si se necesita el historial
+                completo, p.ej. auditoría)
+            flush_workers: Si > 1, un flush con varios chunks los inserta en
+                paralelo, cada uno en su transacción y conexión del pool (el
+                pool debe tener al menos flush_workers conexiones); solo los
+                chunks fallidos se reintentan
         """
         self._engine = engine
         self._buffer_size = buffer_size
+        # Límite de backpressure: por encima se descartan lecturas nuevas
+        self._max_buffered = buffer_size * 2
         self._flush_interval = flush_interval
         self._max_batch_size = max_batch_size
         self._on_flush_callback = on_flush_callback
-
-        self._buffer: List[BufferedReading] = []
+        self._coalesce = coalesce
+        self._rows_per_statement = min(max_batch_size, _MAX_PARAMS_PER_STATEMENT // _INSERT_COLUMNS)
+        # El driver libera el GIL durante el round-trip: con varios workers
+        # la red de un chunk se solapa con el armado de parámetros de otro.
+        # El executor vive entre start() y stop(): un stop/start lo recrea.
+        self._flush_workers = flush_workers
+        self._flush_executor: Optional[ThreadPoolExecutor] = None
+
+        # deque: append/popleft O(1); el drain no re-aloca el resto del buffer
+        self._buffer: Deque[BufferedReading] = deque()
         self._lock = threading.Lock()
-        self._stop_event = threading.Event()
-        self._flush_thread: Optional[threading.Thread] = None
-
-        # Métricas
-        self._total_buffered = 0
+        # Serializa los flushes (scheduler y stop()): el drenaje y el reencolado
+        # de _retry y el INSERT ocurren de a un flush por vez.
+        self._flush_lock = threading.Lock()
+        # Lecturas de flushes fallidos. Solo se tocan bajo _flush_lock y se
+        # drenan antes que el buffer: el reintento no toma el lock de los
+        # productores.
+        self._retry: Deque[BufferedReading] = deque()
+        self._started = False
+
+        # Métricas. buffered/dropped se cuentan por thread productor, fuera
+        # del lock del buffer, y se agregan solo al leerlas.
+        self._tls = threading.local()
+        self._thread_counters: List[_ThreadCounters] = []
+        self._thread_counters_lock = threading.Lock()
         self._total_flushed = 0
-        self._total_dropped = 0
+        self._total_coalesced = 0
+
+    def _counters(self) -> _ThreadCounters:
+        """Contadores del thread actual (registrados en el primer uso)."""
+        counters = getattr(self._tls, "counters", None)
+        if counters is None:
+            counters = _ThreadCounters()
+            self._tls.counters = counters
+            with self._thread_counters_lock:
+                self._thread_counters.append(counters)
+        return counters
+
+    @property
+    def total_buffered(self) -> int:
+        with self._thread_counters_lock:
+            return sum(c.buffered for c in self._thread_counters)
+
+    @property
+    def total_dropped(self) -> int:
+        with self._thread_counters_lock:
+            return sum(c.dropped for c in self._thread_counters)
 
     def start(self):
-        """Inicia el thread de flush periódico."""
-        if self._flush_thread is not None and self._flush_thread.is_alive():
+        """Registra el inserter en el scheduler de flush compartido."""
+        if self._started:
             return
 
-        self._stop_event.clear()
-        self._flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
-        self._flush_thread.start()
+        self._started = True
+        if self._flush_workers > 1 and self._flush_executor is None:
+            self._flush_executor = ThreadPoolExecutor(
+                max_workers=self._flush_workers, thread_name_prefix="batch-insert"
+            )
+        _flush_scheduler.register(self)
         logger.info("BatchInserter started with buffer_size=%d, flush_interval=%.1fs",
                     self._buffer_size, self._flush_interval)
 
@@ -91,23 +286,29 @@ class BatchInserter:
         Args:
             flush_remaining: Si True, hace flush de lecturas pendientes antes de parar
         """
-        self._stop_event.set()
+        self._started = False
+        _flush_scheduler.unregister(self)
 
-        if flush_remaining:
-            self._do_flush()
+        # Espera el flush programado en curso; uno que arranque después ve
+        # _started en False y no hace nada, así nada queda en _retry tras stop()
+        with self._flush_lock:
+            if flush_remaining:
+                self._flush_locked()
 
-        if self._flush_thread is not None:
-            self._flush_thread.join(timeout=5.0)
-            self._flush_thread = None
+            # Bajo el lock: ningún flush está usando el executor al cerrarlo
+            if self._flush_executor is not None:
+                self._flush_executor.shutdown(wait=True)
+                self._flush_executor = None
 
         logger.info("BatchInserter stopped. Stats: buffered=%d, flushed=%d, dropped=%d",
-                    self._total_buffered, self._total_flushed, self._total_dropped)
+                    self.total_buffered, self._total_flushed, self.total_dropped)
 
     def add(
         self,
         sensor_id: int,
         value: float,
         device_timestamp: Optional[datetime] = None,
+        ingest_timestamp: Optional[datetime] = None,
     ) -> bool:
         """Agrega una lectura al buffer.
 
@@ -115,111 +316,209 @@ class BatchInserter:
             sensor_id: ID del sensor
             value: Valor de la lectura
             device_timestamp: Timestamp del dispositivo (opcional)
+            ingest_timestamp: Timestamp de ingesta ya calculado; los callers
+                de lotes lo calculan una vez por lote (opcional)
 
         Returns:
             True si se agregó, False si se descartó por backpressure
         """
-        reading = BufferedReading(
-            sensor_id=sensor_id,
-            value=value,
-            device_timestamp=device_timestamp,
-            ingest_timestamp=datetime.now(timezone.utc),
+        # time_ns() es mucho más barato que datetime.now(tz); la conversión
+        # se hace en el thread de flush, fuera del camino de los productores.
+        reading = (
+            sensor_id,
+            value,
+            time.time_ns() if ingest_timestamp is None else ingest_timestamp,
+            device_timestamp,
         )
 
-        with self._lock:
-            if len(self._buffer) >= self._buffer_size * 2:
-                # Backpressure: buffer muy lleno, descartar
-                self._total_dropped += 1
-                logger.warning("BatchInserter buffer full, dropping reading for sensor %d",
-                               sensor_id)
-                return False
-
-            self._buffer.append(reading)
-            self._total_buffered += 1
-
-            # Flush automático si alcanzamos el límite
-            if len(self._buffer) >= self._buffer_size:
-                self._schedule_flush()
-
+        # Double-check: el len() sin lock (lectura atómica en CPython) descarta
+        # sin contención cuando ya hay backpressure; bajo el lock se re-verifica.
+        accepted = len(self._buffer) < self._max_buffered
+        if accepted:
+            with self._lock:
+                accepted = len(self._buffer) < self._max_buffered
+                if accepted:
+                    self._buffer.append(reading)
+
+                    # Flush automático al alcanzar el límite; si el buffer
+                    # sigue lleno tras un flush el scheduler lo vuelve a ver.
+                    if len(self._buffer) == self._buffer_size:
+                        self._schedule_flush()
+
+        counters = self._counters()
+        if not accepted:
+            # Backpressure: buffer muy lleno, descartar
+            counters.dropped += 1
+            logger.warning("BatchInserter buffer full, dropping reading for sensor %d",
+                           sensor_id)
+            return False
+
+        counters.buffered += 1
         return True
 
     def _schedule_flush(self):
-        """Programa un flush inmediato (llamado desde add cuando buffer está lleno)."""
-        # El flush se hará en el próximo ciclo del thread
-        pass
-
-    def _flush_loop(self):
-        """Loop principal del thread de flush."""
-        while not self._stop_event.is_set():
-            time.sleep(self._flush_interval)
-            if self._stop_event.is_set():
-                break
-            self._do_flush()
-
-    def _do_flush(self):
-        """Ejecuta el flush del buffer a la BD."""
-        with self._lock:
-            if not self._buffer:
-                return
+        """Pide un flush inmediato al scheduler (llamado desde add)."""
+        _flush_scheduler.wake()
 
-            # Tomar lecturas del buffer
-            to_flush = self._buffer[:self._max_batch_size]
-            self._buffer = self._buffer[self._max_batch_size:]
+    def _do_flush(self) -> bool:
+        """Flush programado (thread del scheduler).
 
-        if not to_flush:
-            return
+        Returns:
+            False si el INSERT falló y las lecturas quedaron para reintento
+        """
+        with self._flush_lock:
+            if not self._started:
+                return True
+            return self._flush_locked()
+
+    def _flush_locked(self) -> bool:
+        """Ejecuta el flush del buffer a la BD (con _flush_lock tomado)."""
+        retry = self._retry
+        to_flush = [retry.popleft() for _ in range(min(len(retry), self._max_batch_size))]
+        room = self._max_batch_size - len(to_flush)
+
+        if room and self._buffer:
+            with self._lock:
+                # Tomar lecturas del buffer. Si todo cabe en el lote se cambia
+                # el deque por uno vacío (O(1) bajo el lock) y se copia fuera.
+                if len(self._buffer) <= room:
+                    drained, self._buffer = self._buffer, deque()
+                else:
+                    popleft = self._buffer.popleft
+                    drained = [popleft() for _ in range(room)]
+            to_flush.extend(drained)
 
-        try:
-            self._bulk_insert(to_flush)
-            self._total_flushed += len(to_flush)
+        if not to_flush:
+            return True
 
-            if self._on_flush_callback:
-                self._on_flush_callback(len(to_flush))
+        rows = to_flush
+        if self._coalesce:
+            # Última lectura por sensor (el dict conserva el orden de llegada)
+            rows = list({r[0]: r for r in to_flush}.values())
 
-            logger.debug("BatchInserter flushed %d readings", len(to_flush))
+        if self._flush_executor is not None and len(rows) > self._rows_per_statement:
+            return self._parallel_flush(to_flush, rows)
 
+        try:
+            self._bulk_insert(rows)
         except Exception as e:
             logger.error("BatchInserter flush error: %s", e)
-            # Re-agregar al buffer para reintentar
-            with self._lock:
-                self._buffer = to_flush + self._buffer
+            # Reintentar en el próximo flush, sin tomar el lock del buffer
+            # (_retry está protegido por _flush_lock)
+            self._retry.extendleft(reversed(to_flush))
+            return False
+
+        self._total_flushed += len(rows)
+        self._total_coalesced += len(to_flush) - len(rows)
+        self._notify_flushed(len(rows))
+        logger.debug("BatchInserter flushed %d readings", len(rows))
+        return True
+
+    def _notify_flushed(self, count: int) -> None:
+        """Llama a on_flush_callback; un error del callback no afecta el flush
+        (las lecturas ya están insertadas: no se reintentan)."""
+        if not self._on_flush_callback:
+            return
+        try:
+            self._on_flush_callback(count)
+        except Exception:
+            logger.exception("BatchInserter on_flush_callback failed")
+
+    def _parallel_flush(self, to_flush: List[BufferedReading], rows: List[BufferedReading]) -> bool:
+        """Inserta los chunks de un flush en paralelo (transacción por chunk).
+
+        Args:
+            to_flush: Lecturas tomadas del buffer/reintentos
+            rows: Las que se insertan (to_flush, o su versión coalescida)
+
+        Returns:
+            False si algún chunk falló; esos chunks quedan para reintento
+        """
+        step = self._rows_per_statement
+        chunks = [rows[i:i + step] for i in range(0, len(rows), step)]
+
+        def insert(chunk: List[BufferedReading]) -> Optional[Exception]:
+            try:
+                self._bulk_insert(chunk)
+                return None
+            except Exception as e:
+                return e
+
+        try:
+            errors = list(self._flush_executor.map(insert, chunks))
+        except Exception:
+            # No se pudo despachar (p.ej. executor cerrado): nada se insertó
+            # y el lote entero vuelve a reintento en lugar de perderse
+            logger.exception("BatchInserter parallel flush could not run")
+            self._retry.extendleft(reversed(to_flush))
+            return False
+        failed = [r for chunk, err in zip(chunks, errors) if err is not None for r in chunk]
+        inserted = len(rows) - len(failed)
+
+        self._total_flushed += inserted
+        self._total_coalesced += len(to_flush) - len(rows)
+        if inserted:
+            self._notify_flushed(inserted)
+
+        if failed:
+            logger.error("BatchInserter flush error (%d/%d chunks): %s",
+                         sum(err is not None for err in errors), len(chunks),
+                         next(err for err in errors if err is not None))
+            self._retry.extendleft(reversed(failed))
+            return False
+
+        logger.debug("BatchInserter flushed %d readings in %d chunks", inserted, len(chunks))
+        return True
 
     def _bulk_insert(self, readings: List[BufferedReading]):
-        """Inserta lecturas en batch usando executemany."""
+        """Inserta lecturas con INSERT multi-fila (un round-trip por chunk).
+
+        Cada chunk respeta el límite de parámetros de SQL Server; los
+        parámetros van posicionales vía exec_driver_sql, sin la expansión
+        de parámetros nombrados de SQLAlchemy.
+        """
         if not readings:
             return
 
+        rows_per_statement = self._rows_per_statement
+
         with self._engine.begin() as conn:
-            # Preparar datos para bulk insert
-            # Esquema: sensor_readings(sensor_id, value, timestamp, device_timestamp)
-            values = []
-            for r in readings:
-                values.append({
-                    "sensor_id": r.sensor_id,
-                    "value": r.value,
-                    "timestamp": r.ingest_timestamp,
-                    "device_timestamp": r.device_timestamp,
-                })
-
-            # Bulk INSERT usando executemany
-            conn.execute(
-                text("""
-                    INSERT INTO dbo.sensor_readings (sensor_id, value, timestamp, device_timestamp)
-                    VALUES (:sensor_id, :value, :timestamp, :device_timestamp)
-                """),
-                values,
-            )
+            if conn.dialect.driver == "pyodbc":
+                self._bulk_insert_fast_executemany(conn, _stamp_ingest_timestamps(readings))
+                return
+
+            placeholder = "?" if conn.dialect.paramstyle == "qmark" else "%s"
+
+            for start in range(0, len(readings), rows_per_statement):
+                chunk = readings[start:start + rows_per_statement]
+                conn.exec_driver_sql(
+                    _multi_row_insert_sql(placeholder, len(chunk)), _insert_params(chunk)
+                )
+
+    @staticmethod
+    def _bulk_insert_fast_executemany(conn, readings: List[BufferedReading]):
+        """Camino bulk de pyodbc: fast_executemany envía el lote como un
+        array de parámetros (un round-trip), sin límite de 2100 parámetros.
+        """
+        cursor = conn.connection.cursor()
+        try:
+            cursor.fast_executemany = True
+            cursor.executemany(_INSERT_ONE_ROW_QMARK, readings)
+        finally:
+            cursor.close()
 
     def get_stats(self) -> dict:
         """Retorna estadísticas del inserter."""
         with self._lock:
             pending = len(self._buffer)
+        pending += len(self._retry)
 
         return {
             "pending": pending,
-            "total_buffered": self._total_buffered,
+            "total_buffered": self.total_buffered,
             "total_flushed": self._total_flushed,
-            "total_dropped": self._total_dropped,
+            "total_coalesced": self._total_coalesced,
+            "total_dropped": self.total_dropped,
             "buffer_size": self._buffer_size,
             "flush_interval": self._flush_interval,
         }
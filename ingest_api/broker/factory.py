@@ -12,7 +12,7 @@ from __future__ import annotations
 
 import os
 import logging
-from typing import Optional
+from typing import Optional, Tuple
 
 from ..core.domain.broker_interface import IReadingBroker, NullBroker
 
@@ -35,6 +35,21 @@ logger = logging.getLogger(__name__)
 
 _broker_instance: Optional[IReadingBroker] = None
 
+# Snapshot (min_interval_seconds, use_redis, redis_url) tomado en el primer
+# create_broker(), cuando el .env ya está cargado; reload_config() lo refresca.
+_broker_config: Optional[Tuple[float, bool, Optional[str]]] = None
+
+
+def reload_config() -> Tuple[float, bool, Optional[str]]:
+    """Relee ML_PUBLISH_MIN_INTERVAL_SECONDS / USE_REDIS_BROKER / REDIS_URL."""
+    global _broker_config
+    _broker_config = (
+        float(os.getenv("ML_PUBLISH_MIN_INTERVAL_SECONDS", "1.0")),
+        os.getenv("USE_REDIS_BROKER", "true").lower() == "true",
+        os.getenv("REDIS_URL"),
+    )
+    return _broker_config
+
 
 def create_broker(
     min_interval_seconds: Optional[float] = None,
@@ -49,13 +64,18 @@ def create_broker(
         logger.warning("[BROKER_FACTORY] ML not available, using NullBroker")
         return NullBroker()
     
+    default_interval, default_use_redis, default_redis_url = (
+        _broker_config or reload_config()
+    )
+    
     if min_interval_seconds is None:
-        min_interval_seconds = float(
-            os.getenv("ML_PUBLISH_MIN_INTERVAL_SECONDS", "1.0")
-        )
+        min_interval_seconds = default_interval
     
     if use_redis is None:
-        use_redis = os.getenv("USE_REDIS_BROKER", "true").lower() == "true"
+        use_redis = default_use_redis
+    
+    if redis_url is None:
+        redis_url = default_redis_url
     
     # Seleccionar broker base
     base_broker: IReadingBroker
@@ -6,16 +6,35 @@ por sensor para evitar saturar a los consumidores.
 
 from __future__ import annotations
 
-from typing import Dict
+import threading
+from array import array
+from typing import Dict, Iterable, List
 
 from ..core.domain.broker_interface import IReadingBroker, Reading
 
 
+# Último timestamp publicado en un ring denso indexado por
+# sensor_id & (_SLOT_COUNT - 1): memoria acotada y acceso O(1). Dos sensores
+# que colisionan en un slot comparten ventana de throttling; con IDs densos
+# por debajo de _SLOT_COUNT no hay colisiones.
+_SLOT_COUNT = 1 << 14
+_NEVER_NS = -(1 << 62)
+
+# Potencia de 2: el lock se elige con slot & (_SHARD_COUNT - 1)
+_SHARD_COUNT = 16
+
+_NS_PER_SECOND = 1_000_000_000
+
+
 class ThrottledReadingBroker(IReadingBroker):
     """Broker con throttling por sensor.
     
     Limita la frecuencia de publicación para evitar saturar
     a los consumidores (ML Worker, Decision Orchestrator).
+    
+    Thread-safe: el check-and-set del último timestamp se hace bajo el
+    lock del shard del slot, así dos threads con sensores distintos
+    rara vez compiten y la publicación queda fuera de la sección crítica.
     """
     
     def __init__(
@@ -25,20 +44,67 @@ class ThrottledReadingBroker(IReadingBroker):
         min_interval_seconds: float = 1.0
     ) -> None:
         self._inner = inner
+        # Bound method resuelto una vez: publish no repite el lookup por lectura
+        self._inner_publish = inner.publish
         self._min_interval_seconds = float(min_interval_seconds)
-        self._last_published_ts_by_sensor: Dict[int, float] = {}
+        # Comparaciones en ns enteros: sin pérdida de precisión en epochs grandes
+        self._min_interval_ns = int(self._min_interval_seconds * _NS_PER_SECOND)
+        self._last_ts_ns = array("q", [_NEVER_NS]) * _SLOT_COUNT
+        self._locks: List[threading.Lock] = [threading.Lock() for _ in range(_SHARD_COUNT)]
     
     def publish(self, reading: Reading) -> None:
         """Publica si ha pasado el intervalo mínimo desde la última publicación."""
-        last_ts = self._last_published_ts_by_sensor.get(reading.sensor_id)
+        slot = reading.sensor_id & (_SLOT_COUNT - 1)
+        ts_ns = int(reading.timestamp * _NS_PER_SECOND)
+        last_ts_ns = self._last_ts_ns
         
-        if last_ts is not None:
-            elapsed = reading.timestamp - last_ts
-            if elapsed < self._min_interval_seconds:
+        with self._locks[slot & (_SHARD_COUNT - 1)]:
+            if ts_ns - last_ts_ns[slot] < self._min_interval_ns:
                 return
+            last_ts_ns[slot] = ts_ns
+        
+        self._inner_publish(reading)
+    
+    def publish_many(self, readings: Iterable[Reading]) -> int:
+        """Publica un lote aplicando el mismo throttling que publish().
+        
+        Agrupa por shard para tomar cada lock una sola vez por lote en vez
+        de una vez por lectura. Dentro del lote se respeta el orden, así
+        que varias lecturas del mismo sensor se throttlean entre sí, y las
+        admitidas se reenvían en el orden de entrada (el mismo que daría
+        publish() lectura por lectura).
+        
+        Returns:
+            Cantidad de lecturas admitidas y reenviadas al broker interno
+        """
+        readings = list(readings)
+        slot_mask = _SLOT_COUNT - 1
+        shard_mask = _SHARD_COUNT - 1
+        by_shard: Dict[int, List[int]] = {}
+        for idx, reading in enumerate(readings):
+            by_shard.setdefault(reading.sensor_id & shard_mask, []).append(idx)
+        
+        min_interval_ns = self._min_interval_ns
+        last_ts_ns = self._last_ts_ns
+        admitted = [False] * len(readings)
+        for shard_idx, indexes in by_shard.items():
+            with self._locks[shard_idx]:
+                for idx in indexes:
+                    reading = readings[idx]
+                    slot = reading.sensor_id & slot_mask
+                    ts_ns = int(reading.timestamp * _NS_PER_SECOND)
+                    if ts_ns - last_ts_ns[slot] < min_interval_ns:
+                        continue
+                    last_ts_ns[slot] = ts_ns
+                    admitted[idx] = True
         
-        self._last_published_ts_by_sensor[reading.sensor_id] = float(reading.timestamp)
-        self._inner.publish(reading)
+        publish = self._inner_publish
+        count = 0
+        for reading, ok in zip(readings, admitted):
+            if ok:
+                publish(reading)
+                count += 1
+        return count
     
     def is_connected(self) -> bool:
         """Check if broker is connected."""
@@ -3,6 +3,8 @@
 Estructura modular:
 - models.py: Dataclasses (ReadingClass, ClassifiedReading, etc.)
 - thresholds.py: Gestión de umbrales desde BD
+- in_list.py: Helpers de IN expandido por lotes de sensor_id
+- ttl_cache.py: Cache LRU/TTL acotado para la metadata por sensor
 - delta_detector.py: Detección de delta spikes
 - consecutive_tracker.py: Tracker de lecturas consecutivas
 - reading_classifier.py: Clasificador principal
@@ -22,6 +24,7 @@ from .models import (
     DeltaThreshold,
     LastReading,
     CanonicalThresholds,
+    SensorMetadata,
 )
 from .state_models import SensorOperationalState, SensorStateInfo
 from .state_manager import SensorStateManager
@@ -38,6 +41,7 @@ __all__ = [
     "DeltaThreshold",
     "LastReading",
     "CanonicalThresholds",
+    "SensorMetadata",
     "SensorStateManager",
     "SensorOperationalState",
     "SensorStateInfo",
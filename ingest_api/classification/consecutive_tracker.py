@@ -6,16 +6,18 @@ determinar cuándo generar alertas.
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Dict
+from typing import Dict, Optional
 
+from .thresholds import CACHE_MAX_SENSORS
+from .ttl_cache import trim_oldest
 
-@dataclass
-class ConsecutiveState:
-    """Estado de lecturas consecutivas de un sensor."""
-    count: int = 0
-    last_state: str = 'NORMAL'
-    last_value: float = None
+
+# Estado y conteo empaquetados en un int por sensor: state << 24 | count.
+# NORMAL (conteo 0) no se guarda: un sensor sin entrada está en NORMAL.
+# Tabla fija: un estado fuera de ella es un error del llamador.
+_STATE_CODES = {'NORMAL': 0, 'WARNING': 1, 'ALERT': 2}
+_STATE_SHIFT = 24
+_COUNT_MASK = (1 << _STATE_SHIFT) - 1
 
 
 class ConsecutiveTracker:
@@ -30,42 +32,46 @@ class ConsecutiveTracker:
     DEFAULT_CONSECUTIVE_READINGS = 3
     
     def __init__(self):
-        self._cache: Dict[int, ConsecutiveState] = {}
+        # Solo sensores fuera de NORMAL, acotado a CACHE_MAX_SENSORS
+        self._cache: Dict[int, int] = {}
     
-    def update(self, sensor_id: int, new_state: str, value: float) -> int:
+    def update(self, sensor_id: int, new_state: str, value: Optional[float] = None) -> int:
         """Actualiza y retorna el conteo de lecturas consecutivas.
         
         Args:
             sensor_id: ID del sensor
             new_state: Nuevo estado ('NORMAL', 'WARNING', 'ALERT')
-            value: Valor actual de la lectura
+            value: Ignorado (el valor no se guarda); se acepta por compatibilidad
             
         Returns:
             Número de lecturas consecutivas en el estado actual
+        
+        Raises:
+            ValueError: Si new_state no es uno de los estados soportados
         """
-        current = self._cache.get(sensor_id, ConsecutiveState())
+        code = _STATE_CODES.get(new_state)
+        if code is None:
+            raise ValueError(f"Estado no soportado: {new_state!r}")
         
-        if new_state == 'NORMAL':
-            self._cache[sensor_id] = ConsecutiveState(
-                count=0, last_state='NORMAL', last_value=value
-            )
+        # Vuelta a NORMAL (o NORMAL → NORMAL, el caso dominante): sin entrada
+        if code == 0:
+            self._cache.pop(sensor_id, None)
             return 0
         
-        if current.last_state == new_state:
-            new_count = current.count + 1
+        prev = self._cache.get(sensor_id)
+        if prev is not None and prev >> _STATE_SHIFT == code:
+            count = min((prev & _COUNT_MASK) + 1, _COUNT_MASK)
         else:
-            new_count = 1
-        
-        self._cache[sensor_id] = ConsecutiveState(
-            count=new_count, last_state=new_state, last_value=value
-        )
+            count = 1
         
-        return new_count
+        self._cache[sensor_id] = (code << _STATE_SHIFT) | count
+        if prev is None:
+            trim_oldest(self._cache, CACHE_MAX_SENSORS)
+        return count
     
     def get_count(self, sensor_id: int) -> int:
         """Obtiene el conteo actual de lecturas consecutivas."""
-        state = self._cache.get(sensor_id)
-        return state.count if state else 0
+        return self._cache.get(sensor_id, 0) & _COUNT_MASK
     
     def reset(self, sensor_id: int):
         """Resetea el tracker para un sensor."""
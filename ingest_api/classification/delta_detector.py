@@ -6,27 +6,129 @@ umbrales de delta y slope.
 
 from __future__ import annotations
 
-from datetime import datetime, timezone
-from typing import Optional
+import time
+from datetime import datetime
+from typing import Optional, Tuple
 
-from sqlalchemy import text
 from sqlalchemy.engine import Connection
 from sqlalchemy.orm import Session
 
-from .models import DeltaThreshold, LastReading
-from .thresholds import ThresholdManager
+from .models import DeltaThreshold, LastReading, to_epoch_seconds
+from .thresholds import CACHE_MAX_SENSORS, ThresholdManager
+from .ttl_cache import trim_oldest
+
+
+# Posición de cada tipo de evento en la lista de cooldowns de un sensor
+_EVENT_SLOTS = {'WARNING': 0, 'ALERT': 1}
+
+
+def _delta_kernel(
+    current_value: float,
+    last_value: float,
+    dt_seconds: float,
+    limits: Tuple[float, float, float, float],
+    noise_abs: float,
+    noise_rel: float,
+) -> Tuple[int, float, float, float, float, float]:
+    """Aritmética de delta/slope: solo floats locales, sin objetos ni dicts.
+
+    Se llama una vez por lectura desde Python, así que compilarla (numba,
+    Cython) no ahorra nada: el costo es el dispatch de la llamada, no los
+    flops. Mantenerla pura y sin dependencias la deja lista para vectorizar
+    por lote si algún día hace falta.
+
+    Returns:
+        (mask, delta_abs, delta_rel, slope_abs, slope_rel, dt_seconds); mask
+        tiene un bit por umbral disparado (abs_delta, rel_delta, abs_slope,
+        rel_slope) y es 0 si la diferencia es ruido
+    """
+    delta_abs = abs(current_value - last_value)
+
+    # Calcular delta relativo
+    abs_last = abs(last_value)
+    delta_rel = delta_abs / abs_last if abs_last > 1e-6 else 0.0
+
+    # Filtrar ruido
+    if delta_abs < noise_abs and delta_rel < noise_rel:
+        return 0, delta_abs, delta_rel, 0.0, 0.0, dt_seconds
+
+    # Evitar división por cero
+    if dt_seconds <= 0:
+        dt_seconds = 0.001
+
+    slope_abs = delta_abs / dt_seconds
+    slope_rel = delta_rel / dt_seconds
+
+    # Cuatro comparaciones sin ramas (límites ausentes = inf)
+    abs_delta_t, rel_delta_t, abs_slope_t, rel_slope_t = limits
+    mask = (
+        (delta_abs >= abs_delta_t)
+        | (delta_rel >= rel_delta_t) << 1
+        | (slope_abs >= abs_slope_t) << 2
+        | (slope_rel >= rel_slope_t) << 3
+    )
+    return mask, delta_abs, delta_rel, slope_abs, slope_rel, dt_seconds
+
+
+# Texto de cada umbral disparado, por tag de triggered_thresholds
+_REASON_FORMATS = {
+    "abs_delta": "delta_abs={:.4f} >= {:.4f}",
+    "rel_delta": "delta_rel={:.4%} >= {:.4%}",
+    "abs_slope": "slope_abs={:.4f} >= {:.4f}",
+    "rel_slope": "slope_rel={:.4f} >= {:.4f}",
+}
 
 
-# Umbrales de ruido por tipo de sensor
-SENSOR_TYPE_NOISE_THRESHOLDS = {
-    'temperature': (0.5, 0.02),    # 0.5°C abs, 2% rel
-    'humidity': (2.0, 0.03),        # 2% abs, 3% rel
-    'air_quality': (50.0, 0.10),    # 50 ppm abs, 10% rel
-    'voltage': (1.0, 0.05),         # 1V abs, 5% rel
-    'power': (10.0, 0.10),          # 10W abs, 10% rel
-    'pressure': (0.5, 0.005),       # 0.5 hPa abs, 0.5% rel
-    'default': (0.1, 0.01),         # Conservador
-}
+class SpikeReason(tuple):
+    """Tuplas (tag, valor, umbral) de los umbrales disparados.
+
+    Se formatea recién en str(): el texto solo se arma si alguien lo lee
+    (log, persistencia, ClassifiedReading.reason).
+    """
+
+    __slots__ = ()
+
+    def __str__(self) -> str:
+        return "; ".join(
+            _REASON_FORMATS[tag].format(value, threshold) for tag, value, threshold in self
+        )
+
+
+def _spike_info(
+    mask: int,
+    delta_abs: float,
+    delta_rel: float,
+    slope_abs: float,
+    slope_rel: float,
+    dt_seconds: float,
+    last_value: float,
+    delta_threshold: DeltaThreshold,
+) -> dict:
+    """Resultado de un spike a partir de la salida de _delta_kernel (mask != 0)."""
+    abs_delta_t, rel_delta_t, abs_slope_t, rel_slope_t = delta_threshold.limits
+    parts = []
+    if mask & 1:
+        parts.append(("abs_delta", delta_abs, abs_delta_t))
+    if mask & 2:
+        parts.append(("rel_delta", delta_rel, rel_delta_t))
+    if mask & 4:
+        parts.append(("abs_slope", slope_abs, abs_slope_t))
+    if mask & 8:
+        parts.append(("rel_slope", slope_rel, rel_slope_t))
+
+    return {
+        "is_spike": True,
+        "delta_abs": delta_abs,
+        "delta_rel": delta_rel,
+        "slope_abs": slope_abs,
+        "slope_rel": slope_rel,
+        "dt_seconds": dt_seconds,
+        "last_value": last_value,
+        "triggered_thresholds": [tag for tag, _, _ in parts],
+        "severity": delta_threshold.severity,
+        # str(info["reason"]) para el texto
+        "reason": SpikeReason(parts),
+    }
 
 
 class DeltaDetector:
@@ -37,128 +139,70 @@ class DeltaDetector:
     def __init__(self, db: Session | Connection, threshold_manager: ThresholdManager):
         self._db = db
         self._thresholds = threshold_manager
-        self._sensor_type_cache: dict[int, str] = {}
-        self._cooldown_cache: dict[int, dict[str, datetime]] = {}
+        # sensor_id → expiración (time.monotonic()) por slot de _EVENT_SLOTS;
+        # acotado a CACHE_MAX_SENSORS (sale primero el cooldown más viejo)
+        self._cooldown_cache: dict[int, list[float]] = {}
     
     def check_delta_spike(
         self,
         sensor_id: int,
         current_value: float,
-        current_ts: datetime,
+        current_ts: float | datetime,
         last_reading: LastReading,
+        delta_threshold: Optional[DeltaThreshold] = None,
     ) -> Optional[dict]:
         """Verifica si hay un delta spike.
         
+        Args:
+            current_ts: Timestamp de la lectura, preferentemente como epoch
+                en segundos (un datetime se convierte)
+            delta_threshold: Umbral ya resuelto por el llamador; si no se pasa
+                se obtiene de ThresholdManager
+        
         Returns:
             dict con is_spike=True si se detecta spike, None en caso contrario
         """
-        delta_threshold = self._thresholds.get_delta_threshold(sensor_id)
+        if delta_threshold is None:
+            delta_threshold = self._thresholds.get_delta_threshold(sensor_id)
         if not delta_threshold:
             return None
 
-        # Obtener umbrales de ruido específicos
-        sensor_type = self._get_sensor_type(sensor_id)
-        noise_abs, noise_rel = SENSOR_TYPE_NOISE_THRESHOLDS.get(
-            sensor_type, SENSOR_TYPE_NOISE_THRESHOLDS['default']
-        )
-
-        # Calcular delta y dt
-        delta_abs = abs(current_value - last_reading.value)
-        dt_seconds = (current_ts - last_reading.timestamp).total_seconds()
-
-        # Calcular delta relativo
-        delta_rel = 0.0
-        if abs(last_reading.value) > 1e-6:
-            delta_rel = abs(delta_abs / last_reading.value)
+        if current_ts.__class__ is not float:
+            current_ts = to_epoch_seconds(current_ts)
 
-        # Filtrar ruido
-        is_noise = delta_abs < noise_abs and delta_rel < noise_rel
-        if is_noise:
+        mask, delta_abs, delta_rel, slope_abs, slope_rel, dt_seconds = _delta_kernel(
+            current_value, last_reading.value, current_ts - last_reading.ts_epoch,
+            delta_threshold.limits, delta_threshold.noise_abs, delta_threshold.noise_rel,
+        )
+        if not mask:
             return None
+        return _spike_info(
+            mask, delta_abs, delta_rel, slope_abs, slope_rel, dt_seconds,
+            last_reading.value, delta_threshold,
+        )
 
-        # Evitar división por cero
-        if dt_seconds <= 0:
-            dt_seconds = 0.001
-
-        slope_abs = delta_abs / dt_seconds
-        slope_rel = delta_rel / dt_seconds if dt_seconds > 0 else 0.0
-
-        # Verificar umbrales
-        triggered = []
-        reason_parts = []
-
-        if delta_threshold.abs_delta is not None and delta_abs >= delta_threshold.abs_delta:
-            triggered.append("abs_delta")
-            reason_parts.append(f"delta_abs={delta_abs:.4f} >= {delta_threshold.abs_delta:.4f}")
-
-        if delta_threshold.rel_delta is not None and delta_rel >= delta_threshold.rel_delta:
-            triggered.append("rel_delta")
-            reason_parts.append(f"delta_rel={delta_rel:.4%} >= {delta_threshold.rel_delta:.4%}")
-
-        if delta_threshold.abs_slope is not None and slope_abs >= delta_threshold.abs_slope:
-            triggered.append("abs_slope")
-            reason_parts.append(f"slope_abs={slope_abs:.4f} >= {delta_threshold.abs_slope:.4f}")
-
-        if delta_threshold.rel_slope is not None and slope_rel >= delta_threshold.rel_slope:
-            triggered.append("rel_slope")
-            reason_parts.append(f"slope_rel={slope_rel:.4f} >= {delta_threshold.rel_slope:.4f}")
-
-        if not triggered:
-            return None
+    def is_in_cooldown(self, sensor_id: int, event_type: str) -> bool:
+        """Verifica si el sensor está en período de cooldown (sin efectos).
 
-        return {
-            "is_spike": True,
-            "delta_abs": delta_abs,
-            "delta_rel": delta_rel,
-            "slope_abs": slope_abs,
-            "slope_rel": slope_rel,
-            "dt_seconds": dt_seconds,
-            "last_value": last_reading.value,
-            "triggered_thresholds": triggered,
-            "severity": delta_threshold.severity,
-            "reason": "; ".join(reason_parts),
-        }
+        El cache guarda el instante de expiración (time.monotonic()): la
+        verificación es una comparación. El cooldown lo abre record_event().
+        """
+        expiries = self._cooldown_cache.get(sensor_id)
+        return expiries is not None and expiries[_EVENT_SLOTS[event_type]] > time.monotonic()
 
-    def is_in_cooldown(self, sensor_id: int, event_type: str) -> bool:
-        """Verifica si el sensor está en período de cooldown."""
-        now = datetime.now(timezone.utc)
-        
-        if sensor_id not in self._cooldown_cache:
-            self._cooldown_cache[sensor_id] = {}
-        
-        last_event = self._cooldown_cache[sensor_id].get(event_type)
-        if last_event:
-            elapsed = (now - last_event).total_seconds()
-            if elapsed < self.COOLDOWN_SECONDS:
-                return True
-        
-        self._cooldown_cache[sensor_id][event_type] = now
-        return False
+    def record_event(self, sensor_id: int, event_type: str) -> None:
+        """Abre el cooldown tras emitir un evento."""
+        expiries = self._cooldown_cache.get(sensor_id)
+        if expiries is None:
+            expiries = self._cooldown_cache[sensor_id] = [0.0] * len(_EVENT_SLOTS)
+            trim_oldest(self._cooldown_cache, CACHE_MAX_SENSORS)
+        expiries[_EVENT_SLOTS[event_type]] = time.monotonic() + self.COOLDOWN_SECONDS
 
     def clear_cooldown(self, sensor_id: int, event_type: str = None):
         """Limpia el cooldown de un sensor."""
-        if sensor_id in self._cooldown_cache:
-            if event_type:
-                self._cooldown_cache[sensor_id].pop(event_type, None)
-            else:
-                self._cooldown_cache[sensor_id] = {}
-
-    def _get_sensor_type(self, sensor_id: int) -> str:
-        """Obtiene el tipo de sensor desde la BD."""
-        if sensor_id in self._sensor_type_cache:
-            return self._sensor_type_cache[sensor_id]
-        
-        try:
-            row = self._db.execute(
-                text("SELECT sensor_type FROM dbo.sensors WHERE id = :sensor_id"),
-                {"sensor_id": sensor_id},
-            ).fetchone()
-            
-            sensor_type = 'default'
-            if row and row[0]:
-                sensor_type = str(row[0]).lower().strip()
-            
-            self._sensor_type_cache[sensor_id] = sensor_type
-            return sensor_type
-        except Exception:
-            return 'default'
+        if event_type:
+            expiries = self._cooldown_cache.get(sensor_id)
+            if expiries is not None:
+                expiries[_EVENT_SLOTS[event_type]] = 0.0
+        else:
+            self._cooldown_cache.pop(sensor_id, None)
@@ -0,0 +1,39 @@
+"""Helpers para consultas con IN expandido sobre listas de sensor_id.
+
+Compartidos por thresholds.py (metadata) y state_repository.py (estados).
+"""
+
+from __future__ import annotations
+
+from typing import List
+
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+# SQL Server admite 2100 parámetros por sentencia
+MAX_IDS_PER_QUERY = 1024
+
+
+def padded_ids(ids: List[int]) -> List[int]:
+    """Rellena la lista hasta la siguiente potencia de 2 repitiendo el último id.
+
+    El IN expandido genera un texto SQL distinto por cantidad de ids; con
+    buckets de potencias de 2 SQL Server reutiliza ~11 planes en lugar de
+    compilar uno por tamaño de lote. Los ids repetidos no cambian el resultado.
+    """
+    size = 1 << (len(ids) - 1).bit_length()
+    return ids + [ids[-1]] * (size - len(ids))
+
+
+def in_list_ids(db: Session | Connection, ids: List[int]) -> List[int]:
+    """ids para un IN expandido: con relleno solo si el driver lo aprovecha.
+
+    Solo pyodbc envía parámetros al servidor (sp_prepexec) y reutiliza plan
+    por texto SQL. pymssql, el driver por defecto, los sustituye en el
+    cliente: SQL Server recibe una lista literal, así que el relleno solo
+    agregaría ids duplicados.
+    """
+    bind = db.get_bind() if isinstance(db, Session) else db
+    if bind.dialect.driver == "pyodbc":
+        return padded_ids(ids)
+    return ids
@@ -6,10 +6,29 @@ usados en el proceso de clasificación.
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from datetime import datetime
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
 from enum import Enum
-from typing import Optional
+from typing import Optional, Tuple
+
+
+def to_epoch_seconds(ts: datetime) -> float:
+    """Epoch en segundos de un datetime; los naive se asumen UTC."""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp()
+
+
+# Umbrales de ruido por tipo de sensor
+SENSOR_TYPE_NOISE_THRESHOLDS = {
+    'temperature': (0.5, 0.02),    # 0.5°C abs, 2% rel
+    'humidity': (2.0, 0.03),        # 2% abs, 3% rel
+    'air_quality': (50.0, 0.10),    # 50 ppm abs, 10% rel
+    'voltage': (1.0, 0.05),         # 1V abs, 5% rel
+    'power': (10.0, 0.10),          # 10W abs, 10% rel
+    'pressure': (0.5, 0.005),       # 0.5 hPa abs, 0.5% rel
+    'default': (0.1, 0.01),         # Conservador
+}
 
 
 class ReadingClass(Enum):
@@ -20,7 +39,7 @@ class ReadingClass(Enum):
     ML_PREDICTION = "ml_prediction"  # Dato limpio para ML
 
 
-@dataclass
+@dataclass(slots=True)
 class CanonicalThresholds:
     """Umbrales canónicos WARNING/ALERT para subordinar semántica de delta spike."""
 
@@ -28,18 +47,40 @@ class CanonicalThresholds:
     warning_max: Optional[float] = None
     alert_min: Optional[float] = None
     alert_max: Optional[float] = None
-
-
-@dataclass
+    # (min, max) WARNING con -inf/inf por lado ausente; (inf, -inf) si no hay
+    # banda: "dentro de la banda" es una sola comparación encadenada.
+    warning_band: Tuple[float, float] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        inf = float("inf")
+        if self.warning_min is None and self.warning_max is None:
+            self.warning_band = (inf, -inf)
+        else:
+            self.warning_band = (
+                -inf if self.warning_min is None else self.warning_min,
+                inf if self.warning_max is None else self.warning_max,
+            )
+
+
+@dataclass(slots=True)
 class PhysicalRange:
     """Rango físico del sensor (hard limits)."""
 
     min_value: Optional[float]
     max_value: Optional[float]
     threshold_id: Optional[int] = None
+    # (min, max) con -inf/inf por lado ausente
+    bounds: Tuple[float, float] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        inf = float("inf")
+        self.bounds = (
+            -inf if self.min_value is None else self.min_value,
+            inf if self.max_value is None else self.max_value,
+        )
 
 
-@dataclass
+@dataclass(slots=True)
 class DeltaThreshold:
     """Umbrales de detección de delta/spike."""
 
@@ -48,18 +89,38 @@ class DeltaThreshold:
     abs_slope: Optional[float] = None
     rel_slope: Optional[float] = None
     severity: str = "warning"
-
-
-@dataclass
+    # Piso de ruido del tipo de sensor, resuelto al cachear el umbral
+    noise_abs: float = SENSOR_TYPE_NOISE_THRESHOLDS['default'][0]
+    noise_rel: float = SENSOR_TYPE_NOISE_THRESHOLDS['default'][1]
+    # (abs_delta, rel_delta, abs_slope, rel_slope) con inf en lugar de None:
+    # un límite ausente nunca dispara y la comparación no necesita ramas.
+    limits: Tuple[float, float, float, float] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        inf = float("inf")
+        self.limits = tuple(
+            inf if v is None else v
+            for v in (self.abs_delta, self.rel_delta, self.abs_slope, self.rel_slope)
+        )
+
+
+@dataclass(slots=True)
 class LastReading:
     """Última lectura conocida del sensor."""
 
     value: float
     timestamp: datetime
     reading_id: Optional[int] = None
+    # Epoch UTC de timestamp, calculado una vez al cachear la lectura
+    ts_epoch: float = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.ts_epoch = (
+            to_epoch_seconds(self.timestamp) if self.timestamp is not None else float("-inf")
+        )
 
 
-@dataclass
+@dataclass(slots=True)
 class ClassifiedReading:
     """Resultado de la clasificación de una lectura."""
 
@@ -69,4 +130,28 @@ class ClassifiedReading:
     classification: ReadingClass
     physical_range: Optional[PhysicalRange] = None
     delta_info: Optional[dict] = None
-    reason: str = ""
+    # Motivo diferido: plantilla %-style + argumentos, formateado solo al leer
+    # .reason (casi nunca en el camino caliente)
+    reason_template: str = ""
+    reason_args: tuple = ()
+
+    @property
+    def reason(self) -> str:
+        if not self.reason_args:
+            return self.reason_template
+        return self.reason_template % self.reason_args
+
+
+@dataclass(slots=True)
+class SensorMetadata:
+    """Toda la metadata de clasificación de un sensor, en un solo registro.
+
+    Un lookup por lectura en lugar de uno por cada cache de umbrales.
+    """
+
+    physical_range: Optional[PhysicalRange]
+    canonical_thresholds: Optional[CanonicalThresholds]
+    delta_threshold: Optional[DeltaThreshold]
+    last_reading: Optional[LastReading]
+    sensor_type: str = "default"
+    consecutive_readings: Optional[int] = None
@@ -8,37 +8,54 @@ Clasifica lecturas en 3 categorías:
 
 from __future__ import annotations
 
-from datetime import datetime, timezone
-from typing import Optional
+import time
+from math import isfinite
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
 
 from sqlalchemy.engine import Connection
 from sqlalchemy.orm import Session
 
-# Import condicional para evitar dependencia circular
-try:
-    from iot_machine_learning.ml_service.utils.numeric_precision import safe_float, is_valid_sensor_value
-except ImportError:
-    # Fallback si ML no está disponible
-    def safe_float(value, default=0.0):
-        try:
-            return float(value)
-        except (TypeError, ValueError):
-            return default
-    
-    def is_valid_sensor_value(value):
-        try:
-            f = float(value)
-            return not (f != f)  # Check for NaN
-        except (TypeError, ValueError):
-            return False
-
-from .models import ReadingClass, ClassifiedReading, PhysicalRange
+from .models import (
+    CanonicalThresholds,
+    ClassifiedReading,
+    PhysicalRange,
+    ReadingClass,
+    SensorMetadata,
+    to_epoch_seconds,
+)
 from .state_manager import SensorStateManager
 from .state_models import SensorOperationalState
 from .thresholds import ThresholdManager
 from .delta_detector import DeltaDetector
 from .consecutive_tracker import ConsecutiveTracker
 
+# Miembros del enum ligados una vez: evita el lookup en la clase Enum por lectura
+_ALERT = ReadingClass.ALERT
+_WARNING = ReadingClass.WARNING
+_ML_PREDICTION = ReadingClass.ML_PREDICTION
+
+# Motivos constantes: un único str compartido por todas las lecturas
+_REASON_CLEAN = "Dato dentro de rango físico y sin delta spike"
+_REASON_IN_WARNING_BAND = "Dentro de rango WARNING; delta spike no aplica"
+_REASON_COOLDOWN = "Delta spike en cooldown"
+
+
+# Predicados del camino caliente como funciones de módulo con tipos concretos:
+# sin self ni bound method por lectura, y compilables tal cual (mypyc).
+def _violates_range(value: float, physical_range: PhysicalRange) -> bool:
+    """Verifica si un valor viola el rango físico."""
+    lo, hi = physical_range.bounds
+    return not lo <= value <= hi
+
+
+def _is_within_warning_band(value: float, th: Optional[CanonicalThresholds]) -> bool:
+    """Verifica si el valor está dentro del rango WARNING."""
+    if th is None:
+        return False
+    lo, hi = th.warning_band
+    return lo <= value <= hi
+
 
 class ReadingClassifier:
     """Clasificador de lecturas por propósito.
@@ -51,14 +68,28 @@ class ReadingClassifier:
     - Sensor en INITIALIZING → NUNCA genera eventos
     - Sensor en STALE → NUNCA genera eventos
     - Sensor en NORMAL → puede generar WARNING/ALERT
+    
+    ESTADO EN MEMORIA:
+    - Compartido por todo el proceso: metadata/umbrales (caches TTL acotados
+      de thresholds.py; los cambios de umbrales se ven al expirar el TTL)
+    - Por instancia, nunca entre classifiers: estado operacional, conteo de
+      lecturas consecutivas y cooldowns. Un classifier por sesión/lote; no
+      mantener uno vivo indefinidamente.
     """
 
     def __init__(self, db: Session | Connection) -> None:
+        """db: Session o Connection del llamador.
+
+        Todas las consultas corren dentro de su transacción (autobegin de
+        SQLAlchemy 2.0) y el clasificador nunca hace commit: un lote cuesta un
+        solo BEGIN/COMMIT, el que emita el llamador. No envolver cada
+        classify() en su propio begin().
+        """
         self._db = db
-        self._state_manager = SensorStateManager(db)
-        self._thresholds = ThresholdManager(db)
-        self._delta_detector = DeltaDetector(db, self._thresholds)
-        self._consecutive = ConsecutiveTracker()
+        self._state_manager: SensorStateManager = SensorStateManager(db)
+        self._thresholds: ThresholdManager = ThresholdManager(db)
+        self._delta_detector: DeltaDetector = DeltaDetector(db, self._thresholds)
+        self._consecutive: ConsecutiveTracker = ConsecutiveTracker()
 
     def classify(
         self,
@@ -66,62 +97,90 @@ class ReadingClassifier:
         value: float,
         device_timestamp: Optional[datetime] = None,
         ingest_timestamp: Optional[datetime] = None,
+        *,
+        now: Optional[float] = None,
     ) -> ClassifiedReading:
         """Clasifica una lectura según su propósito.
 
+        now: epoch (time.time()) a usar cuando no hay ingest_timestamp;
+        classify_batch lo toma una vez para todo el lote.
+
         Orden de evaluación:
         0. MODELO DE ESTADOS: Verificar si sensor puede generar eventos
         1. Verificar violación de rango físico → ALERT
         2. Verificar delta spike → WARNING
         3. Resto → ML_PREDICTION
         """
-        if ingest_timestamp is None:
-            ingest_timestamp = datetime.now(timezone.utc)
-
-        # Validación NaN/Infinity
-        if not is_valid_sensor_value(value):
+        # Validación NaN/Infinity/None: una sola llamada en C
+        try:
+            valid = isfinite(value)
+        except TypeError:
+            valid = False
+        if not valid:
             return ClassifiedReading(
                 sensor_id=sensor_id,
-                value=safe_float(value, 0.0),
+                value=0.0,
                 device_timestamp=device_timestamp,
-                classification=ReadingClass.ML_PREDICTION,
-                reason=f"Valor inválido (NaN/Infinity/None): {value}",
+                classification=_ML_PREDICTION,
+                reason_template="Valor inválido (NaN/Infinity/None): %s",
+                reason_args=(value,),
             )
 
+        # Timestamps como epoch float en todo el camino caliente
+        if ingest_timestamp is not None:
+            ingest_ts = to_epoch_seconds(ingest_timestamp)
+        else:
+            ingest_ts = time.time() if now is None else now
+
+        # Metadata del sensor: un solo lookup de cache (un round-trip si está
+        # frío). Si la carga falla, meta queda None y se usan los get_*.
+        meta = self._thresholds.get_metadata(sensor_id)
+        if meta is None and self._thresholds.warm_sensor_metadata(sensor_id):
+            meta = self._thresholds.get_metadata(sensor_id)
+
         # PASO 0: Verificar si sensor puede generar eventos
-        self._state_manager.register_valid_reading(sensor_id)
-        can_generate, state_reason = self._state_manager.can_generate_events(sensor_id)
-        
-        if not can_generate:
+        # Una sola llamada al gestor en el caso normal; el motivo del bloqueo
+        # solo se pide cuando el sensor no puede generar eventos
+        state_info = self._state_manager.register_valid_reading(sensor_id)
+        if not state_info.can_generate_events:
+            _, state_reason = self._state_manager.can_generate_events(sensor_id)
             return ClassifiedReading(
                 sensor_id=sensor_id,
                 value=value,
                 device_timestamp=device_timestamp,
-                classification=ReadingClass.ML_PREDICTION,
-                reason=f"Sensor bloqueado: {state_reason}",
+                classification=_ML_PREDICTION,
+                reason_template="Sensor bloqueado: %s",
+                reason_args=(state_reason,),
             )
 
         # PASO 1: Verificar violación de rango físico
-        result = self._check_physical_range(sensor_id, value, device_timestamp)
+        physical_range = (
+            meta.physical_range if meta is not None
+            else self._thresholds.get_physical_range(sensor_id)
+        )
+        result = self._check_physical_range(sensor_id, value, device_timestamp, physical_range)
         if result:
             return result
 
         # Resetear contador si está dentro del rango
-        self._consecutive.update(sensor_id, 'NORMAL', value)
+        self._consecutive.update(sensor_id, 'NORMAL')
 
         # Verificar si está dentro del rango WARNING (no evaluar delta spike)
-        thresholds = self._thresholds.get_canonical_thresholds(sensor_id)
-        if self._is_within_warning_band(value, thresholds):
+        thresholds = (
+            meta.canonical_thresholds if meta is not None
+            else self._thresholds.get_canonical_thresholds(sensor_id)
+        )
+        if _is_within_warning_band(value, thresholds):
             return ClassifiedReading(
                 sensor_id=sensor_id,
                 value=value,
                 device_timestamp=device_timestamp,
-                classification=ReadingClass.ML_PREDICTION,
-                reason="Dentro de rango WARNING; delta spike no aplica",
+                classification=_ML_PREDICTION,
+                reason_template=_REASON_IN_WARNING_BAND,
             )
 
         # PASO 2: Verificar delta spike
-        result = self._check_delta_spike(sensor_id, value, device_timestamp, ingest_timestamp)
+        result = self._check_delta_spike(sensor_id, value, device_timestamp, ingest_ts, meta)
         if result:
             return result
 
@@ -130,31 +189,64 @@ class ReadingClassifier:
             sensor_id=sensor_id,
             value=value,
             device_timestamp=device_timestamp,
-            classification=ReadingClass.ML_PREDICTION,
-            reason="Dato dentro de rango físico y sin delta spike",
+            classification=_ML_PREDICTION,
+            reason_template=_REASON_CLEAN,
         )
 
+    def classify_batch(
+        self,
+        readings: Iterable[Tuple[int, float, Optional[datetime], Optional[datetime]]],
+    ) -> List[ClassifiedReading]:
+        """Clasifica un lote de lecturas.
+
+        La metadata y el estado de todos los sensores del lote se cargan con
+        una consulta cada uno (IN sobre los sensor_id distintos); luego cada
+        lectura pasa por classify() con los caches ya calientes.
+
+        Args:
+            readings: Tuplas (sensor_id, value[, device_timestamp[, ingest_timestamp]])
+
+        Returns:
+            Un ClassifiedReading por lectura, en el mismo orden
+        """
+        readings = list(readings)
+        sensor_ids = list(dict.fromkeys(r[0] for r in readings))
+        has_metadata = self._thresholds.has_metadata
+        cold = [sid for sid in sensor_ids if not has_metadata(sid)]
+        if cold:
+            self._thresholds.warm_sensors_metadata(cold)
+        self._state_manager.warm_states(sensor_ids)
+
+        # Un solo reloj para el lote: la diferencia dentro de un lote no importa
+        now = time.time()
+        classify = self.classify
+        return [classify(*r, now=now) for r in readings]
+
     def _check_physical_range(
-        self, sensor_id: int, value: float, device_timestamp: Optional[datetime]
+        self,
+        sensor_id: int,
+        value: float,
+        device_timestamp: Optional[datetime],
+        physical_range: Optional[PhysicalRange],
     ) -> Optional[ClassifiedReading]:
         """Verifica violación de rango físico."""
-        physical_range = self._thresholds.get_physical_range(sensor_id)
         if not physical_range:
             return None
         
-        if not self._violates_range(value, physical_range):
+        if not _violates_range(value, physical_range):
             return None
         
         consecutive_required = self._thresholds.get_consecutive_readings_required(sensor_id)
-        consecutive_count = self._consecutive.update(sensor_id, 'ALERT', value)
+        consecutive_count = self._consecutive.update(sensor_id, 'ALERT')
         
         if consecutive_count < consecutive_required:
             return ClassifiedReading(
                 sensor_id=sensor_id,
                 value=value,
                 device_timestamp=device_timestamp,
-                classification=ReadingClass.ML_PREDICTION,
-                reason=f"Fuera de rango, {consecutive_count}/{consecutive_required} consecutivas",
+                classification=_ML_PREDICTION,
+                reason_template="Fuera de rango, %d/%d consecutivas",
+                reason_args=(consecutive_count, consecutive_required),
             )
         
         self._state_manager.transition_to(sensor_id, SensorOperationalState.ALERT)
@@ -163,9 +255,10 @@ class ReadingClassifier:
             sensor_id=sensor_id,
             value=value,
             device_timestamp=device_timestamp,
-            classification=ReadingClass.ALERT,
+            classification=_ALERT,
             physical_range=physical_range,
-            reason=f"Valor {value} fuera de rango [{physical_range.min_value}, {physical_range.max_value}]",
+            reason_template="Valor %s fuera de rango [%s, %s]",
+            reason_args=(value, physical_range.min_value, physical_range.max_value),
         )
 
     def _check_delta_spike(
@@ -173,27 +266,29 @@ class ReadingClassifier:
         sensor_id: int,
         value: float,
         device_timestamp: Optional[datetime],
-        ingest_timestamp: datetime,
+        ingest_ts: float,
+        meta: Optional[SensorMetadata],
     ) -> Optional[ClassifiedReading]:
-        """Verifica delta spike."""
-        last_reading = self._thresholds.get_last_reading(sensor_id)
-        if not last_reading:
+        """Verifica delta spike (ingest_ts en epoch segundos UTC)."""
+        # Sin umbral de delta no hay nada que evaluar: ni última lectura ni
+        # detector (caso común en sensores solo con rango físico)
+        if meta is not None:
+            delta_threshold = meta.delta_threshold
+            last_reading = meta.last_reading
+        else:
+            delta_threshold = self._thresholds.get_delta_threshold(sensor_id)
+            last_reading = delta_threshold and self._thresholds.get_last_reading(sensor_id)
+        if not delta_threshold or not last_reading:
             return None
         
-        # Validar que el historial sea reciente (máximo 10 minutos)
-        last_ts = last_reading.timestamp
-        if last_ts.tzinfo is None:
-            last_ts = last_ts.replace(tzinfo=timezone.utc)
-        ingest_ts_utc = ingest_timestamp
-        if ingest_ts_utc.tzinfo is None:
-            ingest_ts_utc = ingest_ts_utc.replace(tzinfo=timezone.utc)
-        
-        age_seconds = (ingest_ts_utc - last_ts).total_seconds()
-        if age_seconds > 600:
+        # Validar que el historial sea reciente (máximo 10 minutos). La BD ya
+        # descarta las más viejas, pero la lectura cacheada envejece y
+        # ingest_ts puede venir del llamador.
+        if ingest_ts - last_reading.ts_epoch > 600:
             return None
         
         delta_info = self._delta_detector.check_delta_spike(
-            sensor_id, value, ingest_timestamp, last_reading
+            sensor_id, value, ingest_ts, last_reading, delta_threshold
         )
         
         if not delta_info or not delta_info.get("is_spike"):
@@ -204,37 +299,19 @@ class ReadingClassifier:
                 sensor_id=sensor_id,
                 value=value,
                 device_timestamp=device_timestamp,
-                classification=ReadingClass.ML_PREDICTION,
-                reason="Delta spike en cooldown",
+                classification=_ML_PREDICTION,
+                reason_template=_REASON_COOLDOWN,
             )
         
         self._state_manager.transition_to(sensor_id, SensorOperationalState.WARNING)
+        self._delta_detector.record_event(sensor_id, 'WARNING')
         
         return ClassifiedReading(
             sensor_id=sensor_id,
             value=value,
             device_timestamp=device_timestamp,
-            classification=ReadingClass.WARNING,
+            classification=_WARNING,
             delta_info=delta_info,
-            reason=f"Delta spike: {delta_info.get('reason', '')}",
+            reason_template="Delta spike: %s",
+            reason_args=(delta_info.get('reason', ''),),
         )
-
-    def _violates_range(self, value: float, physical_range: PhysicalRange) -> bool:
-        """Verifica si un valor viola el rango físico."""
-        if physical_range.min_value is not None and value < physical_range.min_value:
-            return True
-        if physical_range.max_value is not None and value > physical_range.max_value:
-            return True
-        return False
-
-    def _is_within_warning_band(self, value: float, th) -> bool:
-        """Verifica si el valor está dentro del rango WARNING."""
-        if th is None:
-            return False
-        if th.warning_min is not None and value < th.warning_min:
-            return False
-        if th.warning_max is not None and value > th.warning_max:
-            return False
-        if th.warning_min is None and th.warning_max is None:
-            return False
-        return True
@@ -5,7 +5,8 @@ FUENTE ÚNICA DE VERDAD para el estado del sensor.
 
 from __future__ import annotations
 
-from typing import Optional, Tuple
+import time
+from typing import Iterable, Optional, Tuple
 
 from sqlalchemy.engine import Connection
 from sqlalchemy.orm import Session
@@ -16,6 +17,12 @@ from .state_models import (
     is_valid_transition,
 )
 from .state_repository import StateRepository
+from .thresholds import CACHE_MAX_SENSORS
+from .ttl_cache import trim_oldest
+
+
+# Motivo de "puede generar eventos" por estado, armado una vez
+_STATE_REASONS = {state: f"Estado {state.value}" for state in SensorOperationalState}
 
 
 class SensorStateManager:
@@ -28,11 +35,21 @@ class SensorStateManager:
     """
     
     DEFAULT_MIN_READINGS = 10
+    # Un estado cacheado fuera de warm-up se reutiliza sin ir a la BD durante
+    # este tiempo; pasado, se relee (otro proceso pudo transicionarlo)
+    STATE_RECHECK_SECONDS = 30.0
     
     def __init__(self, db: Session | Connection) -> None:
         self._db = db
         self._repo = StateRepository(db)
+        # Dicts por sensor acotados a CACHE_MAX_SENSORS (trim_oldest al
+        # insertar un sensor nuevo): una entrada descartada solo cuesta releer
         self._cache: dict[int, SensorStateInfo] = {}
+        # time.monotonic() de la última lectura de estado desde BD por sensor
+        self._checked_at: dict[int, float] = {}
+        # Modo fallback: lecturas recientes por sensor. Se cuenta en BD una
+        # sola vez y luego se incrementa en memoria por cada lectura válida.
+        self._fallback_counts: dict[int, int] = {}
     
     def get_state(self, sensor_id: int) -> SensorStateInfo:
         """Obtiene el estado actual del sensor."""
@@ -41,12 +58,29 @@ class SensorStateManager:
         
         if self._repo.check_columns_exist():
             info = self._repo.get_state_from_db(sensor_id)
+            self._checked_at[sensor_id] = time.monotonic()
         else:
             info = self._repo.get_state_fallback(sensor_id)
         
         self._cache[sensor_id] = info
+        self._trim()
         return info
     
+    def warm_states(self, sensor_ids: Iterable[int]) -> None:
+        """Carga en cache el estado de los sensores que aún no lo tienen.
+
+        Una consulta IN para todo el lote en lugar de un SELECT por sensor;
+        solo aplica con columnas de estado (el fallback se cuenta por sensor).
+        """
+        cold = [sid for sid in dict.fromkeys(sensor_ids) if sid not in self._cache]
+        if not cold or not self._repo.check_columns_exist():
+            return
+        self._cache.update(self._repo.get_states_from_db(cold))
+        now = time.monotonic()
+        for sensor_id in cold:
+            self._checked_at[sensor_id] = now
+        self._trim()
+    
     def can_generate_events(self, sensor_id: int) -> Tuple[bool, str]:
         """Verifica si el sensor puede generar WARNING/ALERT.
         
@@ -64,17 +98,56 @@ class SensorStateManager:
         if info.state == SensorOperationalState.STALE:
             return False, "Sensor inactivo (STALE)"
         
-        return True, f"Estado {info.state.value}"
+        return True, _STATE_REASONS[info.state]
     
     def register_valid_reading(self, sensor_id: int) -> SensorStateInfo:
-        """Registra una lectura válida y actualiza estado si aplica."""
-        self._cache.pop(sensor_id, None)
+        """Registra una lectura válida y actualiza estado si aplica.
+        
+        El estado resultante queda en cache, así el can_generate_events()
+        que sigue no vuelve a consultar la BD. info.can_generate_events ya
+        responde lo mismo sin una segunda llamada.
+        """
+        previous = self._cache.pop(sensor_id, None)
         
         if self._repo.check_columns_exist():
-            self._repo.increment_valid_readings(sensor_id)
-            return self._repo.get_state_from_db(sensor_id)
+            # Los UPDATE de warm-up solo afectan sensores en INITIALIZING; si
+            # no se escribió nada y el estado es reciente, sigue vigente y la
+            # lectura no cuesta ningún round-trip de estado.
+            now = time.monotonic()
+            if previous is None or previous.state == SensorOperationalState.INITIALIZING:
+                self._repo.increment_valid_readings(sensor_id)
+                info = self._repo.get_state_from_db(sensor_id)
+                self._checked_at[sensor_id] = now
+            elif now - self._checked_at.get(sensor_id, 0.0) > self.STATE_RECHECK_SECONDS:
+                info = self._repo.get_state_from_db(sensor_id)
+                self._checked_at[sensor_id] = now
+            else:
+                info = previous
         else:
-            return self._repo.get_state_fallback(sensor_id)
+            info = self._register_fallback_reading(sensor_id)
+        
+        self._cache[sensor_id] = info
+        if previous is None:
+            self._trim()
+        return info
+    
+    def _trim(self) -> None:
+        """Mantiene los dicts por sensor dentro de CACHE_MAX_SENSORS."""
+        trim_oldest(self._cache, CACHE_MAX_SENSORS)
+        trim_oldest(self._checked_at, CACHE_MAX_SENSORS)
+        trim_oldest(self._fallback_counts, CACHE_MAX_SENSORS)
+    
+    def _register_fallback_reading(self, sensor_id: int) -> SensorStateInfo:
+        """Incrementa el conteo en memoria; COUNT(*) solo la primera vez."""
+        count = self._fallback_counts.get(sensor_id)
+        if count is None:
+            info = self._repo.get_state_fallback(sensor_id)
+            self._fallback_counts[sensor_id] = info.valid_readings_count
+            return info
+        
+        count += 1
+        self._fallback_counts[sensor_id] = count
+        return self._repo.fallback_state_info(sensor_id, count)
     
     def transition_to(
         self, 
@@ -107,8 +180,12 @@ class SensorStateManager:
         """Limpia el cache de estados."""
         if sensor_id:
             self._cache.pop(sensor_id, None)
+            self._checked_at.pop(sensor_id, None)
+            self._fallback_counts.pop(sensor_id, None)
         else:
             self._cache.clear()
+            self._checked_at.clear()
+            self._fallback_counts.clear()
     
     def on_threshold_violated(
         self, 
@@ -2,17 +2,97 @@
 
 from __future__ import annotations
 
-from typing import Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
-from sqlalchemy import text
+from sqlalchemy import Integer, bindparam, text
 from sqlalchemy.engine import Connection
 from sqlalchemy.orm import Session
 
 from .state_models import SensorOperationalState, SensorStateInfo
+from .in_list import MAX_IDS_PER_QUERY, in_list_ids
 
 
 DEFAULT_MIN_READINGS = 10
 
+# Sentencias construidas una vez al importar, con sensor_id tipado
+_SQL_STATE_COLUMNS_EXIST = text("""
+    SELECT 1 FROM INFORMATION_SCHEMA.COLUMNS
+    WHERE TABLE_SCHEMA = 'dbo'
+    AND TABLE_NAME = 'sensors'
+    AND COLUMN_NAME = 'operational_state'
+""")
+
+_SQL_WARMUP_COLUMNS_EXIST = text("""
+    SELECT 1 FROM INFORMATION_SCHEMA.COLUMNS
+    WHERE TABLE_SCHEMA = 'dbo'
+    AND TABLE_NAME = 'sensor_readings_latest'
+    AND COLUMN_NAME = 'recent_count'
+""")
+
+_SQL_SENSOR_STATE = text("""
+    SELECT operational_state, valid_readings_count,
+           min_readings_for_normal, state_changed_at
+    FROM dbo.sensors WHERE id = :sensor_id
+""").bindparams(bindparam("sensor_id", type_=Integer))
+
+# Mismas columnas que _SQL_SENSOR_STATE para los sensores de un lote
+_SQL_SENSOR_STATES = text("""
+    SELECT id, operational_state, valid_readings_count,
+           min_readings_for_normal, state_changed_at
+    FROM dbo.sensors WHERE id IN :sensor_ids
+""").bindparams(bindparam("sensor_ids", expanding=True))
+
+# Solo importa llegar al mínimo de warm-up: el TOP corta el seek en
+# :limit filas en lugar de contar todas las lecturas de 2 horas
+_SQL_RECENT_READING_COUNT = text("""
+    SELECT COUNT(*) as cnt FROM (
+        SELECT TOP (:limit) 1 AS x FROM dbo.sensor_readings
+        WHERE sensor_id = :sensor_id
+        AND timestamp >= DATEADD(HOUR, -2, GETDATE())
+    ) recent
+""").bindparams(
+    bindparam("sensor_id", type_=Integer),
+    bindparam("limit", type_=Integer),
+)
+
+# Migración mssql_001: contador mantenido por trigger, lookup O(1) por sensor.
+# Sin lecturas en las últimas 2 horas la racha no cuenta (mismo criterio que
+# _SQL_RECENT_READING_COUNT).
+_SQL_LATEST_WARMUP = text("""
+    SELECT CASE WHEN latest_timestamp >= DATEADD(HOUR, -2, GETDATE())
+                THEN recent_count ELSE 0 END AS recent_count
+    FROM dbo.sensor_readings_latest
+    WHERE sensor_id = :sensor_id
+""").bindparams(bindparam("sensor_id", type_=Integer))
+
+_SQL_INCREMENT_VALID_READINGS = text("""
+    UPDATE dbo.sensors
+    SET valid_readings_count = valid_readings_count + 1
+    WHERE id = :sensor_id AND operational_state = 'INITIALIZING'
+""").bindparams(bindparam("sensor_id", type_=Integer))
+
+_SQL_PROMOTE_TO_NORMAL = text("""
+    UPDATE dbo.sensors
+    SET operational_state = 'NORMAL', state_changed_at = GETDATE()
+    WHERE id = :sensor_id
+    AND operational_state = 'INITIALIZING'
+    AND valid_readings_count >= min_readings_for_normal
+""").bindparams(bindparam("sensor_id", type_=Integer))
+
+_SQL_UPDATE_STATE = text("""
+    UPDATE dbo.sensors
+    SET operational_state = :new_state,
+        state_changed_at = GETDATE(),
+        valid_readings_count = CASE WHEN :reset = 1 THEN 0
+                               ELSE valid_readings_count END
+    WHERE id = :sensor_id AND operational_state = :expected_state
+""").bindparams(bindparam("sensor_id", type_=Integer))
+
+_SQL_ACTIVE_EVENT_COUNT = text("""
+    SELECT COUNT(*) as cnt FROM dbo.ml_events
+    WHERE sensor_id = :sensor_id AND status = 'active'
+""").bindparams(bindparam("sensor_id", type_=Integer))
+
 
 class StateRepository:
     """Acceso a BD para estado de sensores."""
@@ -20,6 +100,7 @@ class StateRepository:
     def __init__(self, db: Session | Connection):
         self._db = db
         self._columns_exist: Optional[bool] = None
+        self._warmup_columns_exist: Optional[bool] = None
     
     def check_columns_exist(self) -> bool:
         """Verifica si las columnas de estado existen en la BD."""
@@ -27,31 +108,51 @@ class StateRepository:
             return self._columns_exist
         
         try:
-            row = self._db.execute(
-                text("""
-                    SELECT 1 FROM INFORMATION_SCHEMA.COLUMNS 
-                    WHERE TABLE_SCHEMA = 'dbo' 
-                    AND TABLE_NAME = 'sensors' 
-                    AND COLUMN_NAME = 'operational_state'
-                """)
-            ).fetchone()
+            row = self._db.execute(_SQL_STATE_COLUMNS_EXIST).fetchone()
             self._columns_exist = row is not None
         except Exception:
             self._columns_exist = False
         
         return self._columns_exist
     
+    def check_warmup_columns_exist(self) -> bool:
+        """Verifica si sensor_readings_latest tiene el contador de warm-up."""
+        if self._warmup_columns_exist is not None:
+            return self._warmup_columns_exist
+        
+        try:
+            row = self._db.execute(_SQL_WARMUP_COLUMNS_EXIST).fetchone()
+            self._warmup_columns_exist = row is not None
+        except Exception:
+            self._warmup_columns_exist = False
+        
+        return self._warmup_columns_exist
+    
     def get_state_from_db(self, sensor_id: int) -> SensorStateInfo:
         """Obtiene estado desde columnas de BD."""
         row = self._db.execute(
-            text("""
-                SELECT operational_state, valid_readings_count,
-                       min_readings_for_normal, state_changed_at
-                FROM dbo.sensors WHERE id = :sensor_id
-            """),
+            _SQL_SENSOR_STATE,
             {"sensor_id": sensor_id},
         ).fetchone()
-        
+        return self._state_info_from_row(sensor_id, row)
+    
+    def get_states_from_db(self, sensor_ids: List[int]) -> Dict[int, SensorStateInfo]:
+        """Obtiene el estado de varios sensores (una consulta por cada
+        MAX_IDS_PER_QUERY sensores). Los inexistentes quedan UNKNOWN."""
+        states: Dict[int, SensorStateInfo] = {}
+        for start in range(0, len(sensor_ids), MAX_IDS_PER_QUERY):
+            chunk = sensor_ids[start:start + MAX_IDS_PER_QUERY]
+            rows = self._db.execute(
+                _SQL_SENSOR_STATES, {"sensor_ids": in_list_ids(self._db, chunk)}
+            ).fetchall()
+            by_id = {int(row.id): row for row in rows}
+            for sensor_id in chunk:
+                states[sensor_id] = self._state_info_from_row(sensor_id, by_id.get(sensor_id))
+        return states
+    
+    @staticmethod
+    def _state_info_from_row(sensor_id: int, row) -> SensorStateInfo:
+        """SensorStateInfo desde una fila de dbo.sensors (None = inexistente)."""
         if not row:
             return SensorStateInfo(
                 sensor_id=sensor_id,
@@ -84,18 +185,28 @@ class StateRepository:
         )
     
     def get_state_fallback(self, sensor_id: int) -> SensorStateInfo:
-        """Fallback: calcula estado basado en lecturas recientes."""
+        """Fallback: calcula estado basado en lecturas recientes.
+        
+        Con la migración mssql_001 lee el contador de sensor_readings_latest;
+        sin ella, cuenta las lecturas de las últimas 2 horas (hasta el mínimo
+        de warm-up: más allá el estado es el mismo).
+        """
+        if self.check_warmup_columns_exist():
+            row = self._db.execute(_SQL_LATEST_WARMUP, {"sensor_id": sensor_id}).fetchone()
+            count = int(row.recent_count or 0) if row else 0
+            return self.fallback_state_info(sensor_id, count)
+        
         row = self._db.execute(
-            text("""
-                SELECT COUNT(*) as cnt FROM dbo.sensor_readings
-                WHERE sensor_id = :sensor_id
-                AND timestamp >= DATEADD(HOUR, -2, GETDATE())
-            """),
-            {"sensor_id": sensor_id},
+            _SQL_RECENT_READING_COUNT,
+            {"sensor_id": sensor_id, "limit": DEFAULT_MIN_READINGS},
         ).fetchone()
         
         count = int(row.cnt) if row and row.cnt else 0
-        
+        return self.fallback_state_info(sensor_id, count)
+    
+    @staticmethod
+    def fallback_state_info(sensor_id: int, count: int) -> SensorStateInfo:
+        """Estado fallback para un conteo de lecturas recientes dado."""
         if count >= DEFAULT_MIN_READINGS:
             state = SensorOperationalState.NORMAL
             can_generate = True
@@ -116,22 +227,12 @@ class StateRepository:
         """Incrementa contador de lecturas válidas."""
         try:
             self._db.execute(
-                text("""
-                    UPDATE dbo.sensors
-                    SET valid_readings_count = valid_readings_count + 1
-                    WHERE id = :sensor_id AND operational_state = 'INITIALIZING'
-                """),
+                _SQL_INCREMENT_VALID_READINGS,
                 {"sensor_id": sensor_id},
             )
             
             self._db.execute(
-                text("""
-                    UPDATE dbo.sensors
-                    SET operational_state = 'NORMAL', state_changed_at = GETDATE()
-                    WHERE id = :sensor_id
-                    AND operational_state = 'INITIALIZING'
-                    AND valid_readings_count >= min_readings_for_normal
-                """),
+                _SQL_PROMOTE_TO_NORMAL,
                 {"sensor_id": sensor_id},
             )
             return True
@@ -147,14 +248,7 @@ class StateRepository:
     ) -> int:
         """Actualiza estado con optimistic locking. Retorna rows affected."""
         result = self._db.execute(
-            text("""
-                UPDATE dbo.sensors
-                SET operational_state = :new_state,
-                    state_changed_at = GETDATE(),
-                    valid_readings_count = CASE WHEN :reset = 1 THEN 0 
-                                           ELSE valid_readings_count END
-                WHERE id = :sensor_id AND operational_state = :expected_state
-            """),
+            _SQL_UPDATE_STATE,
             {
                 "sensor_id": sensor_id,
                 "new_state": new_state.value,
@@ -168,10 +262,7 @@ class StateRepository:
         """Cuenta eventos ML activos para un sensor."""
         try:
             row = self._db.execute(
-                text("""
-                    SELECT COUNT(*) as cnt FROM dbo.ml_events
-                    WHERE sensor_id = :sensor_id AND status = 'active'
-                """),
+                _SQL_ACTIVE_EVENT_COUNT,
                 {"sensor_id": sensor_id},
             ).fetchone()
             return int(row.cnt) if row and row.cnt else 0
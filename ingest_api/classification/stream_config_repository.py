@@ -18,6 +18,30 @@ from ..core.domain.stream_config import StreamConfig, ValueConstraints
 
 logger = logging.getLogger(__name__)
 
+# Statements built once at import so SQLAlchemy's compiled cache reuses them
+_SQL_STREAM_CONFIG = text("""
+    SELECT
+        id, stream_id, source_id, domain, display_name, unit,
+        enable_ml_prediction, enable_alerting, domain_metadata
+    FROM stream_configs
+    WHERE stream_id = :stream_id
+      AND source_id = :source_id
+      AND domain = :domain
+""")
+
+_SQL_VALUE_CONSTRAINTS = text("""
+    SELECT
+        physical_min, physical_max,
+        operational_min, operational_max,
+        warning_min, warning_max,
+        critical_min, critical_max,
+        max_abs_delta, max_rel_delta,
+        noise_abs_threshold, z_score_threshold,
+        consecutive_violations_required, cooldown_seconds
+    FROM value_constraints
+    WHERE stream_config_id = :config_id
+""")
+
 
 class StreamConfigRepository:
     """Loads and caches StreamConfig from PostgreSQL.
@@ -105,15 +129,7 @@ class StreamConfigRepository:
             with self._engine.connect() as conn:
                 # Load stream config
                 result = conn.execute(
-                    text("""
-                        SELECT 
-                            id, stream_id, source_id, domain, display_name, unit,
-                            enable_ml_prediction, enable_alerting, domain_metadata
-                        FROM stream_configs
-                        WHERE stream_id = :stream_id 
-                          AND source_id = :source_id 
-                          AND domain = :domain
-                    """),
+                    _SQL_STREAM_CONFIG,
                     {
                         "stream_id": stream_id,
                         "source_id": source_id,
@@ -128,18 +144,7 @@ class StreamConfigRepository:
                 
                 # Load constraints
                 constraints_result = conn.execute(
-                    text("""
-                        SELECT 
-                            physical_min, physical_max,
-                            operational_min, operational_max,
-                            warning_min, warning_max,
-                            critical_min, critical_max,
-                            max_abs_delta, max_rel_delta,
-                            noise_abs_threshold, z_score_threshold,
-                            consecutive_violations_required, cooldown_seconds
-                        FROM value_constraints
-                        WHERE stream_config_id = :config_id
-                    """),
+                    _SQL_VALUE_CONSTRAINTS,
                     {"config_id": config_id},
                 ).fetchone()
                 
@@ -4,13 +4,19 @@ Maneja la obtención y cache de umbrales desde la BD:
 - Umbrales canónicos (WARNING/ALERT)
 - Rangos físicos
 - Umbrales de delta/spike
+
+warm_sensor_metadata() carga todo lo que el clasificador necesita de un
+sensor en un solo round-trip; los get_* siguen funcionando solos como
+fallback y para llamadas sueltas.
 """
 
 from __future__ import annotations
 
-from typing import Optional
+import logging
+import sys
+from typing import Iterable, Optional, Tuple
 
-from sqlalchemy import text
+from sqlalchemy import Integer, bindparam, text
 from sqlalchemy.engine import Connection
 from sqlalchemy.orm import Session
 
@@ -24,7 +30,214 @@ except ImportError:
         except (TypeError, ValueError):
             return default
 
-from .models import CanonicalThresholds, PhysicalRange, DeltaThreshold, LastReading
+from .models import (
+    SENSOR_TYPE_NOISE_THRESHOLDS,
+    CanonicalThresholds,
+    PhysicalRange,
+    DeltaThreshold,
+    LastReading,
+    SensorMetadata,
+)
+from .in_list import MAX_IDS_PER_QUERY, in_list_ids
+from .ttl_cache import MISSING, TTLCache
+
+logger = logging.getLogger(__name__)
+
+CACHE_MAX_SENSORS = 50_000
+CONFIG_TTL_SECONDS = 300
+LAST_READING_TTL_SECONDS = 60
+# "Sin configuración" cambia menos que un umbral configurado: TTL más largo
+NEGATIVE_TTL_SECONDS = 900
+
+# Caches compartidos por todas las instancias del proceso: ThresholdManager
+# se crea por sesión/request y caches por instancia empezarían siempre fríos.
+# Registros completos de warm_sensors_metadata(): un lookup por lectura. Su TTL
+# es el de la última lectura, que cambia con cada inserción.
+_METADATA_CACHE: TTLCache[SensorMetadata] = TTLCache(CACHE_MAX_SENSORS, LAST_READING_TTL_SECONDS)
+# Caches por campo de los get_* individuales (fallback): configuración con TTL
+# largo, última lectura con TTL corto.
+_RANGE_CACHE: TTLCache[Optional[PhysicalRange]] = TTLCache(CACHE_MAX_SENSORS, CONFIG_TTL_SECONDS)
+_DELTA_CACHE: TTLCache[Optional[DeltaThreshold]] = TTLCache(CACHE_MAX_SENSORS, CONFIG_TTL_SECONDS)
+_THRESHOLDS_CACHE: TTLCache[Optional[CanonicalThresholds]] = TTLCache(
+    CACHE_MAX_SENSORS, CONFIG_TTL_SECONDS
+)
+_SENSOR_TYPE_CACHE: TTLCache[str] = TTLCache(CACHE_MAX_SENSORS, CONFIG_TTL_SECONDS)
+_CONSECUTIVE_CACHE: TTLCache[Optional[int]] = TTLCache(CACHE_MAX_SENSORS, CONFIG_TTL_SECONDS)
+_LAST_READING_CACHE: TTLCache[Optional[LastReading]] = TTLCache(
+    CACHE_MAX_SENSORS, LAST_READING_TTL_SECONDS
+)
+# Conjunto de sensor_id configurados (una sola entrada), refrescado con el TTL
+# de configuración
+_CONFIGURED_SENSORS: TTLCache[frozenset] = TTLCache(1, CONFIG_TTL_SECONDS)
+
+# Una fila por sensor con toda la metadata de clasificación. Cada OUTER APPLY
+# equivale a la consulta del get_* correspondiente.
+# La última lectura solo sirve si tiene menos de 10 minutos (ventana del delta
+# spike): las más viejas ni se traen y quedan como "sin historial".
+_SQL_SENSOR_METADATA = text("""
+    SELECT s.id AS sensor_id, s.sensor_type,
+           pr.id AS range_id, pr.threshold_value_min AS range_min,
+           pr.threshold_value_max AS range_max,
+           w.id AS warning_id, w.threshold_value_min AS warning_min,
+           w.threshold_value_max AS warning_max,
+           c.id AS critical_id, c.threshold_value_min AS critical_min,
+           c.threshold_value_max AS critical_max,
+           cr.consecutive_readings,
+           d.id AS delta_id, d.abs_delta, d.rel_delta, d.abs_slope, d.rel_slope, d.severity AS delta_severity,
+           l.latest_value, l.latest_timestamp
+    FROM dbo.sensors s
+    OUTER APPLY (
+        SELECT TOP 1 id, threshold_value_min, threshold_value_max
+        FROM dbo.alert_thresholds
+        WHERE sensor_id = s.id AND is_active = 1 AND condition_type = 'out_of_range'
+        ORDER BY id ASC
+    ) pr
+    OUTER APPLY (
+        SELECT TOP 1 id, threshold_value_min, threshold_value_max
+        FROM dbo.alert_thresholds
+        WHERE sensor_id = s.id AND is_active = 1 AND condition_type = 'out_of_range'
+          AND severity = 'warning'
+        ORDER BY id ASC
+    ) w
+    OUTER APPLY (
+        SELECT TOP 1 id, threshold_value_min, threshold_value_max
+        FROM dbo.alert_thresholds
+        WHERE sensor_id = s.id AND is_active = 1 AND condition_type = 'out_of_range'
+          AND severity = 'critical'
+        ORDER BY id ASC
+    ) c
+    OUTER APPLY (
+        SELECT TOP 1 consecutive_readings
+        FROM dbo.alert_thresholds
+        WHERE sensor_id = s.id AND is_active = 1 AND consecutive_readings IS NOT NULL
+        ORDER BY id ASC
+    ) cr
+    OUTER APPLY (
+        SELECT TOP 1 id, abs_delta, rel_delta, abs_slope, rel_slope, severity
+        FROM dbo.delta_thresholds
+        WHERE sensor_id = s.id AND is_active = 1
+        ORDER BY id ASC
+    ) d
+    OUTER APPLY (
+        SELECT TOP 1 latest_value, latest_timestamp
+        FROM dbo.sensor_readings_latest
+        WHERE sensor_id = s.id
+          AND latest_timestamp >= DATEADD(SECOND, -600, SYSUTCDATETIME())
+    ) l
+    WHERE s.id IN :sensor_ids
+""").bindparams(bindparam("sensor_ids", expanding=True))
+
+# Sensores con algún umbral activo. Los que no están ni se consultan: su
+# metadata es la de "sin configuración" (caso común en sensores de prueba).
+_SQL_CONFIGURED_SENSORS = text("""
+    SELECT sensor_id FROM dbo.alert_thresholds WHERE is_active = 1
+    UNION
+    SELECT sensor_id FROM dbo.delta_thresholds WHERE is_active = 1
+""")
+
+# Consultas de los get_* individuales. Construidas una vez al importar, con
+# sensor_id tipado como Integer. Los índices cubrientes de la migración
+# mssql_002 las resuelven (igual que cada OUTER APPLY) con un solo index seek.
+# Una sola fila: primer umbral warning y primer critical (por id), igual que
+# los OUTER APPLY w/c de _SQL_SENSOR_METADATA
+_SQL_CANONICAL_THRESHOLDS = text("""
+    SELECT w.id AS warning_id, w.threshold_value_min AS warning_min,
+           w.threshold_value_max AS warning_max,
+           c.id AS critical_id, c.threshold_value_min AS critical_min,
+           c.threshold_value_max AS critical_max
+    FROM (SELECT :sensor_id AS sensor_id) s
+    OUTER APPLY (
+        SELECT TOP 1 id, threshold_value_min, threshold_value_max
+        FROM dbo.alert_thresholds
+        WHERE sensor_id = s.sensor_id AND is_active = 1 AND condition_type = 'out_of_range'
+          AND severity = 'warning'
+        ORDER BY id ASC
+    ) w
+    OUTER APPLY (
+        SELECT TOP 1 id, threshold_value_min, threshold_value_max
+        FROM dbo.alert_thresholds
+        WHERE sensor_id = s.sensor_id AND is_active = 1 AND condition_type = 'out_of_range'
+          AND severity = 'critical'
+        ORDER BY id ASC
+    ) c
+""").bindparams(bindparam("sensor_id", type_=Integer))
+
+_SQL_PHYSICAL_RANGE = text("""
+    SELECT TOP 1 id, threshold_value_min, threshold_value_max
+    FROM dbo.alert_thresholds
+    WHERE sensor_id = :sensor_id
+      AND is_active = 1
+      AND condition_type = 'out_of_range'
+    ORDER BY id ASC
+""").bindparams(bindparam("sensor_id", type_=Integer))
+
+_SQL_DELTA_THRESHOLD = text("""
+    SELECT TOP 1 abs_delta, rel_delta, abs_slope, rel_slope, severity
+    FROM dbo.delta_thresholds
+    WHERE sensor_id = :sensor_id AND is_active = 1
+    ORDER BY id ASC
+""").bindparams(bindparam("sensor_id", type_=Integer))
+
+_SQL_LAST_READING = text("""
+    SELECT TOP 1 latest_value, latest_timestamp
+    FROM dbo.sensor_readings_latest
+    WHERE sensor_id = :sensor_id
+      AND latest_timestamp >= DATEADD(SECOND, -600, SYSUTCDATETIME())
+""").bindparams(bindparam("sensor_id", type_=Integer))
+
+_SQL_SENSOR_TYPE = text(
+    "SELECT sensor_type FROM dbo.sensors WHERE id = :sensor_id"
+).bindparams(bindparam("sensor_id", type_=Integer))
+
+_SQL_CONSECUTIVE_READINGS = text("""
+    SELECT TOP 1 consecutive_readings
+    FROM dbo.alert_thresholds
+    WHERE sensor_id = :sensor_id
+      AND is_active = 1
+      AND consecutive_readings IS NOT NULL
+    ORDER BY id ASC
+""").bindparams(bindparam("sensor_id", type_=Integer))
+
+
+def _opt_float(value) -> Optional[float]:
+    return safe_float(value, None) if value is not None else None
+
+
+def _physical_range_from(threshold_id, min_value, max_value) -> Optional[PhysicalRange]:
+    min_val = _opt_float(min_value)
+    max_val = _opt_float(max_value)
+    if min_val is None and max_val is None:
+        return None
+    return PhysicalRange(min_value=min_val, max_value=max_val, threshold_id=int(threshold_id))
+
+
+def _last_reading_from(latest_value, latest_timestamp) -> Optional[LastReading]:
+    latest_val = safe_float(latest_value, None)
+    if latest_val is None:
+        return None
+    return LastReading(value=latest_val, timestamp=latest_timestamp)
+
+
+def _canonical_thresholds_from(row) -> Optional[CanonicalThresholds]:
+    """Umbrales canónicos desde las columnas warning_*/critical_* de una fila."""
+    if row.warning_id is None and row.critical_id is None:
+        return None
+    return CanonicalThresholds(
+        warning_min=_opt_float(row.warning_min),
+        warning_max=_opt_float(row.warning_max),
+        alert_min=_opt_float(row.critical_min),
+        alert_max=_opt_float(row.critical_max),
+    )
+
+
+def _sensor_type_from(sensor_type) -> str:
+    # Internado: los miles de sensores de un tipo comparten un único str, y
+    # la clave de SENSOR_TYPE_NOISE_THRESHOLDS se compara por identidad
+    return sys.intern(str(sensor_type).lower().strip()) if sensor_type else 'default'
+
+
+def _noise_for(sensor_type: str) -> Tuple[float, float]:
+    return SENSOR_TYPE_NOISE_THRESHOLDS.get(sensor_type, SENSOR_TYPE_NOISE_THRESHOLDS['default'])
 
 
 class ThresholdManager:
@@ -32,103 +245,194 @@ class ThresholdManager:
     
     def __init__(self, db: Session | Connection):
         self._db = db
-        self._range_cache: dict[int, Optional[PhysicalRange]] = {}
-        self._delta_cache: dict[int, Optional[DeltaThreshold]] = {}
-        self._last_reading_cache: dict[int, Optional[LastReading]] = {}
-        self._thresholds_cache: dict[int, Optional[CanonicalThresholds]] = {}
-    
+        self._metadata_cache = _METADATA_CACHE
+        self._range_cache = _RANGE_CACHE
+        self._delta_cache = _DELTA_CACHE
+        self._last_reading_cache = _LAST_READING_CACHE
+        self._thresholds_cache = _THRESHOLDS_CACHE
+        self._sensor_type_cache = _SENSOR_TYPE_CACHE
+        self._consecutive_cache = _CONSECUTIVE_CACHE
+
+    def has_metadata(self, sensor_id: int) -> bool:
+        """True si toda la metadata del sensor ya está en cache."""
+        return self._metadata_cache.get(sensor_id) is not None
+
+    def get_metadata(self, sensor_id: int) -> Optional[SensorMetadata]:
+        """Registro de metadata cacheado del sensor, o None si está frío."""
+        return self._metadata_cache.get(sensor_id)
+
+    def warm_sensor_metadata(self, sensor_id: int) -> bool:
+        """Carga toda la metadata del sensor en un solo round-trip.
+
+        Returns:
+            False si la consulta falló; los get_* consultan por separado
+        """
+        return self.warm_sensors_metadata((sensor_id,))
+
+    def warm_sensors_metadata(self, sensor_ids: Iterable[int]) -> bool:
+        """Carga la metadata de varios sensores (una consulta por cada
+        MAX_IDS_PER_QUERY sensores).
+
+        Returns:
+            False si alguna consulta falló; esos sensores quedan sin cachear
+        """
+        ids = list(dict.fromkeys(sensor_ids))
+        configured = self._configured_sensors()
+        if configured is not None:
+            # Con el TTL del conjunto y no el negativo: un sensor que recibe su
+            # primer umbral se ve, como mucho, dos CONFIG_TTL_SECONDS después
+            for sensor_id in ids:
+                if sensor_id not in configured:
+                    self._cache_metadata_row(sensor_id, None, ttl=CONFIG_TTL_SECONDS)
+            ids = [sensor_id for sensor_id in ids if sensor_id in configured]
+
+        ok = True
+        for start in range(0, len(ids), MAX_IDS_PER_QUERY):
+            chunk = ids[start:start + MAX_IDS_PER_QUERY]
+            try:
+                rows = self._db.execute(
+                    _SQL_SENSOR_METADATA, {"sensor_ids": in_list_ids(self._db, chunk)}
+                ).fetchall()
+            except Exception as e:
+                logger.warning("Sensor metadata prefetch failed for %d sensors: %s", len(chunk), e)
+                ok = False
+                continue
+
+            by_id = {int(row.sensor_id): row for row in rows}
+            for sensor_id in chunk:
+                self._cache_metadata_row(sensor_id, by_id.get(sensor_id))
+        return ok
+
+    def _configured_sensors(self) -> Optional[frozenset]:
+        """sensor_id con umbrales activos, o None si no se pudo consultar."""
+        configured = _CONFIGURED_SENSORS.get(None)
+        if configured is not None:
+            return configured
+        try:
+            rows = self._db.execute(_SQL_CONFIGURED_SENSORS).fetchall()
+        except Exception as e:
+            logger.warning("Configured sensors lookup failed: %s", e)
+            return None
+        configured = frozenset(int(row[0]) for row in rows)
+        _CONFIGURED_SENSORS.set(None, configured)
+        return configured
+
+    def _cache_metadata_row(
+        self, sensor_id: int, row, ttl: float = NEGATIVE_TTL_SECONDS
+    ) -> None:
+        """Cachea el registro del sensor desde una fila de _SQL_SENSOR_METADATA.
+
+        ttl aplica solo al registro negativo (row None).
+        """
+        if row is None:
+            # Sensor inexistente o sin umbrales: mismo resultado que los get_*
+            # individuales
+            self._metadata_cache.set(
+                sensor_id, SensorMetadata(None, None, None, None), ttl=ttl
+            )
+            return
+
+        sensor_type = _sensor_type_from(row.sensor_type)
+        noise_abs, noise_rel = _noise_for(sensor_type)
+        meta = SensorMetadata(
+            physical_range=(
+                _physical_range_from(row.range_id, row.range_min, row.range_max)
+                if row.range_id is not None else None
+            ),
+            canonical_thresholds=_canonical_thresholds_from(row),
+            delta_threshold=(
+                DeltaThreshold(
+                    abs_delta=_opt_float(row.abs_delta),
+                    rel_delta=_opt_float(row.rel_delta),
+                    abs_slope=_opt_float(row.abs_slope),
+                    rel_slope=_opt_float(row.rel_slope),
+                    severity=str(row.delta_severity or "warning"),
+                    noise_abs=noise_abs,
+                    noise_rel=noise_rel,
+                )
+                if row.delta_id is not None else None
+            ),
+            last_reading=_last_reading_from(row.latest_value, row.latest_timestamp),
+            sensor_type=sensor_type,
+            consecutive_readings=(
+                int(row.consecutive_readings) if row.consecutive_readings else None
+            ),
+        )
+
+        # Sin umbrales de ningún tipo la última lectura no se usa (no hay
+        # delta que evaluar): el registro vale lo que una entrada negativa.
+        unconfigured = (
+            meta.physical_range is None
+            and meta.canonical_thresholds is None
+            and meta.delta_threshold is None
+        )
+        self._metadata_cache.set(
+            sensor_id, meta, ttl=NEGATIVE_TTL_SECONDS if unconfigured else None
+        )
+
     def get_canonical_thresholds(self, sensor_id: int) -> Optional[CanonicalThresholds]:
         """Obtiene umbrales WARNING/ALERT desde alert_thresholds."""
-        if sensor_id in self._thresholds_cache:
-            return self._thresholds_cache[sensor_id]
-
-        rows = self._db.execute(
-            text("""
-                SELECT severity, threshold_value_min, threshold_value_max
-                FROM dbo.alert_thresholds
-                WHERE sensor_id = :sensor_id
-                  AND is_active = 1
-                  AND condition_type = 'out_of_range'
-                  AND severity IN ('warning', 'critical')
-                ORDER BY CASE severity WHEN 'critical' THEN 0 ELSE 1 END, id ASC
-            """),
-            {"sensor_id": sensor_id},
-        ).fetchall()
+        meta = self._metadata_cache.get(sensor_id)
+        if meta is not None:
+            return meta.canonical_thresholds
 
-        if not rows:
-            self._thresholds_cache[sensor_id] = None
-            return None
+        cached = self._thresholds_cache.get(sensor_id, MISSING)
+        if cached is not MISSING:
+            return cached
 
-        warning_min, warning_max = None, None
-        alert_min, alert_max = None, None
-
-        for r in rows:
-            sev = str(getattr(r, "severity", "") or "").lower()
-            min_v = safe_float(getattr(r, "threshold_value_min", None), None)
-            max_v = safe_float(getattr(r, "threshold_value_max", None), None)
-            if sev == "warning" and warning_min is None:
-                warning_min, warning_max = min_v, max_v
-            elif sev == "critical" and alert_min is None:
-                alert_min, alert_max = min_v, max_v
-
-        th = CanonicalThresholds(
-            warning_min=warning_min, warning_max=warning_max,
-            alert_min=alert_min, alert_max=alert_max,
+        row = self._db.execute(
+            _SQL_CANONICAL_THRESHOLDS,
+            {"sensor_id": sensor_id},
+        ).fetchone()
+
+        th = _canonical_thresholds_from(row)
+        self._thresholds_cache.set(
+            sensor_id, th, ttl=NEGATIVE_TTL_SECONDS if th is None else None
         )
-        self._thresholds_cache[sensor_id] = th
         return th
 
     def get_physical_range(self, sensor_id: int) -> Optional[PhysicalRange]:
         """Obtiene el rango físico del sensor."""
-        if sensor_id in self._range_cache:
-            return self._range_cache[sensor_id]
+        meta = self._metadata_cache.get(sensor_id)
+        if meta is not None:
+            return meta.physical_range
+
+        cached = self._range_cache.get(sensor_id, MISSING)
+        if cached is not MISSING:
+            return cached
 
         row = self._db.execute(
-            text("""
-                SELECT TOP 1 id, threshold_value_min, threshold_value_max
-                FROM dbo.alert_thresholds
-                WHERE sensor_id = :sensor_id
-                  AND is_active = 1
-                  AND condition_type = 'out_of_range'
-                ORDER BY id ASC
-            """),
+            _SQL_PHYSICAL_RANGE,
             {"sensor_id": sensor_id},
         ).fetchone()
 
-        if not row:
-            self._range_cache[sensor_id] = None
-            return None
-
-        min_val = safe_float(row.threshold_value_min, None) if row.threshold_value_min is not None else None
-        max_val = safe_float(row.threshold_value_max, None) if row.threshold_value_max is not None else None
-
-        if min_val is None and max_val is None:
-            self._range_cache[sensor_id] = None
-            return None
-
-        physical_range = PhysicalRange(
-            min_value=min_val, max_value=max_val, threshold_id=int(row.id),
+        physical_range = (
+            _physical_range_from(row.id, row.threshold_value_min, row.threshold_value_max)
+            if row else None
+        )
+        self._range_cache.set(
+            sensor_id, physical_range,
+            ttl=NEGATIVE_TTL_SECONDS if physical_range is None else None,
         )
-        self._range_cache[sensor_id] = physical_range
         return physical_range
 
     def get_delta_threshold(self, sensor_id: int) -> Optional[DeltaThreshold]:
         """Obtiene los umbrales de delta para el sensor."""
-        if sensor_id in self._delta_cache:
-            return self._delta_cache[sensor_id]
+        meta = self._metadata_cache.get(sensor_id)
+        if meta is not None:
+            return meta.delta_threshold
+
+        cached = self._delta_cache.get(sensor_id, MISSING)
+        if cached is not MISSING:
+            return cached
 
         row = self._db.execute(
-            text("""
-                SELECT TOP 1 abs_delta, rel_delta, abs_slope, rel_slope, severity
-                FROM dbo.delta_thresholds
-                WHERE sensor_id = :sensor_id AND is_active = 1
-                ORDER BY id ASC
-            """),
+            _SQL_DELTA_THRESHOLD,
             {"sensor_id": sensor_id},
         ).fetchone()
 
         if not row:
-            self._delta_cache[sensor_id] = None
+            self._delta_cache.set(sensor_id, None, ttl=NEGATIVE_TTL_SECONDS)
             return None
 
         delta_threshold = DeltaThreshold(
@@ -138,54 +442,101 @@ class ThresholdManager:
             rel_slope=safe_float(row.rel_slope, None) if row.rel_slope is not None else None,
             severity=str(row.severity or "warning"),
         )
+        # Piso de ruido plegado en el umbral: el detector no vuelve a
+        # resolver el tipo de sensor por lectura
+        delta_threshold.noise_abs, delta_threshold.noise_rel = _noise_for(
+            self.get_sensor_type(sensor_id)
+        )
         self._delta_cache[sensor_id] = delta_threshold
         return delta_threshold
 
     def get_last_reading(self, sensor_id: int) -> Optional[LastReading]:
-        """Obtiene la última lectura del sensor."""
-        if sensor_id in self._last_reading_cache:
-            return self._last_reading_cache[sensor_id]
+        """Obtiene la última lectura del sensor (None si no hay o tiene más
+        de 10 minutos al consultarla)."""
+        meta = self._metadata_cache.get(sensor_id)
+        if meta is not None:
+            return meta.last_reading
+
+        cached = self._last_reading_cache.get(sensor_id, MISSING)
+        if cached is not MISSING:
+            return cached
 
         row = self._db.execute(
-            text("""
-                SELECT TOP 1 latest_value, latest_timestamp
-                FROM dbo.sensor_readings_latest
-                WHERE sensor_id = :sensor_id
-            """),
+            _SQL_LAST_READING,
             {"sensor_id": sensor_id},
         ).fetchone()
 
-        if not row:
-            self._last_reading_cache[sensor_id] = None
-            return None
-
-        latest_val = safe_float(row.latest_value, None)
-        if latest_val is None:
-            self._last_reading_cache[sensor_id] = None
-            return None
-        
-        last_reading = LastReading(value=latest_val, timestamp=row.latest_timestamp)
+        last_reading = _last_reading_from(row.latest_value, row.latest_timestamp) if row else None
         self._last_reading_cache[sensor_id] = last_reading
         return last_reading
 
+    def get_sensor_type(self, sensor_id: int) -> str:
+        """Obtiene el tipo de sensor desde la BD ('default' si no hay)."""
+        meta = self._metadata_cache.get(sensor_id)
+        if meta is not None:
+            return meta.sensor_type
+
+        cached = self._sensor_type_cache.get(sensor_id, MISSING)
+        if cached is not MISSING:
+            return cached
+
+        try:
+            row = self._db.execute(
+                _SQL_SENSOR_TYPE,
+                {"sensor_id": sensor_id},
+            ).fetchone()
+        except Exception:
+            return 'default'
+
+        sensor_type = _sensor_type_from(row[0] if row else None)
+        self._sensor_type_cache[sensor_id] = sensor_type
+        return sensor_type
+
     def get_consecutive_readings_required(self, sensor_id: int, default: int = 3) -> int:
         """Obtiene lecturas consecutivas requeridas para alertar."""
+        meta = self._metadata_cache.get(sensor_id)
+        if meta is not None:
+            return meta.consecutive_readings or default
+
+        cached = self._consecutive_cache.get(sensor_id, MISSING)
+        if cached is not MISSING:
+            return cached if cached else default
+
         try:
             row = self._db.execute(
-                text("""
-                    SELECT TOP 1 consecutive_readings
-                    FROM dbo.alert_thresholds
-                    WHERE sensor_id = :sensor_id
-                      AND is_active = 1
-                      AND consecutive_readings IS NOT NULL
-                    ORDER BY id ASC
-                """),
+                _SQL_CONSECUTIVE_READINGS,
                 {"sensor_id": sensor_id},
             ).fetchone()
-            
-            if row and row[0]:
-                return int(row[0])
         except Exception:
-            pass
-        
-        return default
+            return default
+
+        # None (sin umbral configurado) también se cachea: no reconsultar
+        consecutive = int(row[0]) if row and row[0] else None
+        self._consecutive_cache[sensor_id] = consecutive
+        return consecutive or default
+
+
+_ALL_CACHES = (
+    _METADATA_CACHE, _RANGE_CACHE, _DELTA_CACHE, _THRESHOLDS_CACHE,
+    _SENSOR_TYPE_CACHE, _CONSECUTIVE_CACHE, _LAST_READING_CACHE,
+    _CONFIGURED_SENSORS,
+)
+
+
+def clear_metadata_cache() -> None:
+    """Limpia los caches compartidos de metadata (útil para testing)."""
+    for cache in _ALL_CACHES:
+        cache.clear()
+
+
+def invalidate_sensor(sensor_id: int) -> None:
+    """Descarta la metadata cacheada de un sensor.
+
+    Solo alcanza a los caches de este proceso: hoy nada en el servicio lo
+    llama, porque los umbrales se editan fuera de él. Esos cambios se ven al
+    expirar los TTL (CONFIG_TTL_SECONDS, NEGATIVE_TTL_SECONDS).
+    """
+    for cache in _ALL_CACHES:
+        cache.pop(sensor_id)
+    # Puede haber ganado (o perdido) su primer umbral
+    _CONFIGURED_SENSORS.clear()
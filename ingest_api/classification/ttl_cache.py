@@ -0,0 +1,83 @@
+"""Cache en memoria acotado (LRU) con expiración opcional por entrada.
+
+Mismo esquema que los cachés de pipelines/shared/physical_ranges.py:
+OrderedDict de (valor, expires_at), move_to_end en cada hit y descarte del
+menos usado al superar maxsize. Cachea también None (resultados negativos).
+Thread-safe: las instancias se comparten entre threads del proceso.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+# Centinela para distinguir "no está" de un None cacheado
+MISSING: Any = object()
+
+
+class TTLCache(Generic[V]):
+    """Cache LRU con TTL. Sin ttl, las entradas solo salen por LRU."""
+
+    __slots__ = ("_data", "_maxsize", "_ttl", "_lock")
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self._data: OrderedDict[Hashable, Tuple[V, float]] = OrderedDict()
+        self._maxsize = maxsize
+        self._ttl = float("inf") if ttl is None else ttl
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Valor cacheado o default si no está o expiró."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: V, ttl: Optional[float] = None) -> None:
+        """Guarda value; ttl sobreescribe el TTL por defecto para esta entrada."""
+        expires_at = time.monotonic() + (self._ttl if ttl is None else ttl)
+        with self._lock:
+            data = self._data
+            data[key] = (value, expires_at)
+            data.move_to_end(key)
+            while len(data) > self._maxsize:
+                data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __setitem__(self, key: Hashable, value: V) -> None:
+        self.set(key, value)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, MISSING) is not MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def trim_oldest(data: dict, maxsize: int) -> None:
+    """Descarta las entradas más viejas (orden de inserción) de un dict plano.
+
+    Para los dicts por instancia del camino caliente, donde el lock y la
+    tupla de TTLCache costarían en cada lectura: se llama solo al insertar
+    una clave nueva. Reinsertar (pop + set) una clave la vuelve la más nueva.
+    """
+    while len(data) > maxsize:
+        del data[next(iter(data))]
@@ -25,12 +25,14 @@ class DataPointStatus(Enum):
     FAILED = "failed"
 
 
-@dataclass
+@dataclass(slots=True)
 class DataPoint:
     """Punto de dato universal - agnóstico de dominio.
     
     Este es el nuevo contrato canónico que fluye por el pipeline universal:
     Transport → Validation → Classification → Persistence → ML
+    
+    slots=True: sin __dict__ por instancia (objeto caliente del pipeline).
     """
     
     # CAMPOS OBLIGATORIOS (mínimo viable)
@@ -17,12 +17,14 @@ class ReadingStatus(Enum):
     REJECTED = "rejected"
 
 
-@dataclass
+@dataclass(slots=True)
 class Reading:
     """Lectura de sensor - modelo canónico de dominio.
     
     Este es el contrato único que fluye por todo el pipeline:
     MQTT → Validación → SP → Redis → ML
+    
+    slots=True: sin __dict__ por instancia (objeto caliente del pipeline).
     """
     sensor_id: int
     value: float
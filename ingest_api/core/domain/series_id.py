@@ -8,6 +8,7 @@ Convierte entre:
 
 from __future__ import annotations
 
+from functools import lru_cache
 from typing import Optional
 
 
@@ -21,9 +22,13 @@ class SeriesIdMapper:
     """
     
     @staticmethod
+    @lru_cache(maxsize=65536)
     def iot_sensor_to_series_id(sensor_id: int) -> str:
         """Convierte sensor_id:int a series_id:str.
         
+        Memoizado: el universo de sensor_ids es acotado y el resultado
+        es un string puro, así que cada serie se construye una sola vez.
+        
         Args:
             sensor_id: ID numérico del sensor IoT
             
@@ -16,7 +16,7 @@ from typing import Any, Optional
 from sqlalchemy import text
 from sqlalchemy.engine import Engine
 
-from ..persistence.postgres import get_postgres_engine
+from ..persistence.postgres import dumps_metadata, get_postgres_engine
 
 logger = logging.getLogger(__name__)
 
@@ -88,7 +88,7 @@ class AuditLogger:
                             "data_timestamp": data_point.timestamp,
                             "status": status,
                             "error_message": error_message,
-                            "metadata": data_point.metadata or {},
+                            "metadata": dumps_metadata(data_point.metadata),
                         }
                     )
                 return
@@ -0,0 +1,10 @@
+-- Migration 003: Unique partial index for active API key lookups
+-- La validación filtra por is_active en SQL; este índice solo contiene keys
+-- activos, así que el probe B-tree toca un índice más pequeño y caliente.
+
+-- CONCURRENTLY no puede ejecutarse dentro de una transacción.
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_api_keys_hash_active
+    ON api_keys (key_hash) WHERE is_active;
+
+-- Reemplazado por idx_api_keys_hash_active
+DROP INDEX CONCURRENTLY IF EXISTS idx_api_keys_hash;
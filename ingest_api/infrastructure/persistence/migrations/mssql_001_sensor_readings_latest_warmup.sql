@@ -0,0 +1,54 @@
+-- Migration mssql_001: contador de warm-up en sensor_readings_latest (SQL Server)
+-- Reemplaza el COUNT(*) sobre sensor_readings de las últimas 2 horas que usa
+-- StateRepository.get_state_fallback() por una lectura O(1) de la fila latest.
+--
+-- recent_count: escrituras de la racha actual del sensor, donde una racha se
+-- corta cuando pasan más de 2 horas entre dos lecturas. El mínimo de warm-up
+-- NO vive acá: lo aplica StateRepository (DEFAULT_MIN_READINGS), que además
+-- toma como 0 el contador de un sensor sin lecturas en las últimas 2 horas.
+--
+-- Un trigger lo mantiene para todos los writers (SP de ingesta y MERGEs de
+-- pipelines/) sin cambiarlos. Cuenta escrituras a sensor_readings_latest, que
+-- cada writer hace por lectura: aproxima las filas de sensor_readings.
+
+IF COL_LENGTH('dbo.sensor_readings_latest', 'recent_count') IS NULL
+    ALTER TABLE dbo.sensor_readings_latest
+        ADD recent_count INT NOT NULL
+            CONSTRAINT DF_sensor_readings_latest_recent_count DEFAULT 0;
+GO
+
+-- Backfill: sin esto, tras el deploy todo sensor existente quedaría en
+-- INITIALIZING (eventos bloqueados) hasta juntar lecturas nuevas.
+UPDATE l
+SET recent_count = (
+    SELECT COUNT(*) FROM dbo.sensor_readings r
+    WHERE r.sensor_id = l.sensor_id
+      AND r.timestamp >= DATEADD(HOUR, -2, GETDATE())
+)
+FROM dbo.sensor_readings_latest l;
+GO
+
+CREATE OR ALTER TRIGGER dbo.trg_sensor_readings_latest_warmup
+ON dbo.sensor_readings_latest
+AFTER INSERT, UPDATE
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    -- Evita re-entrar por el propio UPDATE de abajo
+    IF TRIGGER_NESTLEVEL(@@PROCID) > 1 OR NOT UPDATE(latest_timestamp)
+        RETURN;
+
+    -- Fila nueva o más de 2 horas desde la lectura anterior: la racha
+    -- arranca de nuevo en 1
+    UPDATE l
+    SET recent_count = CASE
+        WHEN d.latest_timestamp IS NULL
+          OR d.latest_timestamp < DATEADD(HOUR, -2, i.latest_timestamp) THEN 1
+        ELSE l.recent_count + 1
+    END
+    FROM dbo.sensor_readings_latest l
+    JOIN inserted i ON i.sensor_id = l.sensor_id
+    LEFT JOIN deleted d ON d.sensor_id = i.sensor_id;
+END;
+GO
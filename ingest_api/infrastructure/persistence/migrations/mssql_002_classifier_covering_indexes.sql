@@ -0,0 +1,38 @@
+-- Migration mssql_002: índices cubrientes para las consultas del clasificador (SQL Server)
+-- Cada consulta de ThresholdManager/StateRepository (y cada OUTER APPLY de
+-- _SQL_SENSOR_METADATA) filtra por sensor_id; con estos índices todas se
+-- resuelven con un index seek sin key lookup al índice clustered.
+--
+-- Sin hints WITH (INDEX(...)) en las consultas: un hint a un índice que no
+-- existe es un error, y con el índice cubriente el optimizador ya elige el seek.
+-- El id (clave clustered) va implícito en cada índice, así que el
+-- ORDER BY id de los TOP 1 no necesita sort.
+--
+-- Requiere mssql_001 (columna recent_count).
+
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_srl_sensor' AND object_id = OBJECT_ID('dbo.sensor_readings_latest')
+)
+    CREATE NONCLUSTERED INDEX IX_srl_sensor
+        ON dbo.sensor_readings_latest (sensor_id)
+        INCLUDE (latest_value, latest_timestamp, recent_count);
+GO
+
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_alert_thresholds_classifier' AND object_id = OBJECT_ID('dbo.alert_thresholds')
+)
+    CREATE NONCLUSTERED INDEX IX_alert_thresholds_classifier
+        ON dbo.alert_thresholds (sensor_id, is_active, condition_type)
+        INCLUDE (severity, threshold_value_min, threshold_value_max, consecutive_readings);
+GO
+
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_delta_thresholds_sensor' AND object_id = OBJECT_ID('dbo.delta_thresholds')
+)
+    CREATE NONCLUSTERED INDEX IX_delta_thresholds_sensor
+        ON dbo.delta_thresholds (sensor_id, is_active)
+        INCLUDE (abs_delta, rel_delta, abs_slope, rel_slope, severity);
+GO
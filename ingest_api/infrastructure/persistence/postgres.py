@@ -7,47 +7,35 @@ Define storage completamente nuevo para dominios universales.
 from __future__ import annotations
 
 import logging
-import os
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
-from sqlalchemy import create_engine, text
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    import json
+    ORJSON_AVAILABLE = False
+
+from sqlalchemy import text
 from sqlalchemy.engine import Engine
 
-logger = logging.getLogger(__name__)
+# Un único engine/pool por proceso: el singleton vive en postgres_setup.
+from .postgres_setup import get_postgres_engine
 
-# Singleton engine
-_postgres_engine: Optional[Engine] = None
+logger = logging.getLogger(__name__)
 
 
-def get_postgres_engine() -> Optional[Engine]:
-    """Obtiene el engine de PostgreSQL (singleton).
+def dumps_metadata(metadata: Optional[Dict[str, Any]]) -> str:
+    """Serializa metadata de un DataPoint para columnas JSONB.
     
-    Returns:
-        Engine de PostgreSQL si POSTGRES_URL está configurado, None si no
+    orjson (si está disponible) serializa UUID y datetime de forma nativa,
+    así los adapters no necesitan pre-convertirlos a str.
     """
-    global _postgres_engine
-    
-    if _postgres_engine is not None:
-        return _postgres_engine
-    
-    postgres_url = os.getenv("POSTGRES_URL")
-    if not postgres_url:
-        logger.warning("POSTGRES_URL not configured - universal ingestion will be disabled")
-        return None
-    
-    try:
-        _postgres_engine = create_engine(
-            postgres_url,
-            pool_pre_ping=True,
-            pool_recycle=300,
-            echo=False,
-        )
-        logger.info("PostgreSQL engine created successfully")
-        return _postgres_engine
-    except Exception as e:
-        # ISO 27001: No exponer connection string en logs
-        logger.exception("Failed to create PostgreSQL engine")
-        return None
+    if not metadata:
+        return "{}"
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(metadata).decode("utf-8")
+    return json.dumps(metadata, default=str)
 
 
 class PostgreSQLStorage:
@@ -98,7 +86,7 @@ class PostgreSQLStorage:
                         "stream_id": dp.stream_id,
                         "value": float(dp.value),
                         "timestamp": dp.timestamp,
-                        "metadata": dp.metadata or {},
+                        "metadata": dumps_metadata(dp.metadata),
                         "sequence": dp.sequence,
                     }
                 )
@@ -124,38 +112,49 @@ class PostgreSQLStorage:
             logger.warning("PostgreSQL not available - cannot insert batch")
             return 0
         
-        inserted = 0
+        if not data_points:
+            return 0
+        
+        # Conversión fila por fila: un valor o metadata inválido se descarta
+        # solo (nunca llega a PostgreSQL ni aborta la transacción).
+        rows = []
+        for dp in data_points:
+            try:
+                rows.append({
+                    "series_id": dp.series_id,
+                    "domain": dp.domain,
+                    "source_id": dp.source_id,
+                    "stream_id": dp.stream_id,
+                    "value": float(dp.value),
+                    "timestamp": dp.timestamp,
+                    "metadata": dumps_metadata(dp.metadata),
+                    "sequence": dp.sequence,
+                })
+            except Exception as e:
+                logger.warning(f"Skipping invalid DataPoint in batch: {e}")
+        
+        if not rows:
+            return 0
+        
+        # Un solo executemany: con psycopg2 (executemany_mode
+        # values_plus_batch) viaja vía execute_batch en páginas de 500.
+        # Un error de la BD aborta la transacción entera: esa parte del lote
+        # es todo-o-nada.
         try:
             with self._engine.begin() as conn:
-                for dp in data_points:
-                    try:
-                        conn.execute(
-                            text("""
-                                INSERT INTO data_points (
-                                    series_id, domain, source_id, stream_id,
-                                    value, timestamp, metadata, sequence, ingested_at
-                                ) VALUES (
-                                    :series_id, :domain, :source_id, :stream_id,
-                                    :value, :timestamp, :metadata, :sequence, NOW()
-                                )
-                            """),
-                            {
-                                "series_id": dp.series_id,
-                                "domain": dp.domain,
-                                "source_id": dp.source_id,
-                                "stream_id": dp.stream_id,
-                                "value": float(dp.value),
-                                "timestamp": dp.timestamp,
-                                "metadata": dp.metadata or {},
-                                "sequence": dp.sequence,
-                            }
+                conn.execute(
+                    text("""
+                        INSERT INTO data_points (
+                            series_id, domain, source_id, stream_id,
+                            value, timestamp, metadata, sequence, ingested_at
+                        ) VALUES (
+                            :series_id, :domain, :source_id, :stream_id,
+                            :value, :timestamp, :metadata, :sequence, NOW()
                         )
-                        inserted += 1
-                    except Exception as e:
-                        logger.warning(f"Error inserting DataPoint in batch: {e}")
-                        continue
-            
-            return inserted
+                    """),
+                    rows,
+                )
+            return len(rows)
         except Exception as e:
             logger.exception(f"Error in batch insert: {e}")
-            return inserted
+            return 0
@@ -12,7 +12,7 @@ import os
 from typing import Optional
 
 from sqlalchemy import create_engine, text
-from sqlalchemy.engine import Engine
+from sqlalchemy.engine import Engine, make_url
 
 logger = logging.getLogger(__name__)
 
@@ -45,11 +45,22 @@ def get_postgres_engine() -> Optional[Engine]:
     logger.info("[PostgreSQL] Creating engine from POSTGRES_URL")
     
     try:
+        engine_kwargs = {}
+        if make_url(postgres_url).get_driver_name() == "psycopg2":
+            # executemany: insertmanyvalues para Insert() y execute_batch para
+            # SQL textual, ambos en páginas de 500 filas
+            engine_kwargs = {
+                "executemany_mode": "values_plus_batch",
+                "insertmanyvalues_page_size": 500,
+                "executemany_batch_page_size": 500,
+            }
+        
         _postgres_engine = create_engine(
             postgres_url,
             pool_pre_ping=True,
             pool_recycle=300,
             future=True,
+            **engine_kwargs,
         )
         
         # Test connection
@@ -93,6 +93,8 @@ async def startup_event():
             buffer_size=int(os.getenv("BATCH_BUFFER_SIZE", "100")),
             flush_interval=float(os.getenv("BATCH_FLUSH_INTERVAL", "5.0")),
             max_batch_size=int(os.getenv("BATCH_MAX_SIZE", "500")),
+            coalesce=os.getenv("BATCH_COALESCE", "false").lower() == "true",
+            flush_workers=int(os.getenv("BATCH_FLUSH_WORKERS", "1")),
         )
         logger.info("BatchInserter inicializado correctamente")
     except Exception as e:
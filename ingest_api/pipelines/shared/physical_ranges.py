@@ -121,17 +121,15 @@ def get_all_thresholds(db: Session, sensor_id: int) -> List[ThresholdRule]:
         {"sensor_id": sensor_id},
     ).fetchall()
 
+    # Desempaquetado posicional (orden del SELECT): sin lookup por nombre en Row
     thresholds = []
-    for row in rows:
-        min_val = float(row.threshold_value_min) if row.threshold_value_min is not None else None
-        max_val = float(row.threshold_value_max) if row.threshold_value_max is not None else None
-        
+    for threshold_id, condition_type, min_val, max_val, severity in rows:
         thresholds.append(ThresholdRule(
-            threshold_id=int(row.id),
-            condition_type=str(row.condition_type or 'out_of_range'),
-            min_value=min_val,
-            max_value=max_val,
-            severity=str(row.severity or 'warning'),
+            threshold_id=int(threshold_id),
+            condition_type=str(condition_type or 'out_of_range'),
+            min_value=float(min_val) if min_val is not None else None,
+            max_value=float(max_val) if max_val is not None else None,
+            severity=str(severity or 'warning'),
         ))
     
     # Guardar en caché
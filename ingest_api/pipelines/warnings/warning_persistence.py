@@ -49,7 +49,7 @@ def _build_spike_message(delta_info: dict) -> str:
     
     reason = delta_info.get("reason", "")
     if reason and not parts:
-        return reason
+        return str(reason)
     
     return ". ".join(parts) if parts else "Cambio detectado fuera del comportamiento normal."
 
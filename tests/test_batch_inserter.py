@@ -0,0 +1,122 @@
+"""Tests del BatchInserter y su scheduler de flush compartido."""
+
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from iot_ingest_services.ingest_api.batch_inserter import BatchInserter
+
+
+class _FakeConnection:
+    dialect = SimpleNamespace(driver="psycopg2", paramstyle="format")
+
+    def __init__(self, engine: "_FakeEngine"):
+        self._engine = engine
+
+    def exec_driver_sql(self, sql, params):
+        with self._engine.lock:
+            self._engine.rows += len(params) // 4
+
+
+class _FakeEngine:
+    """Engine mínimo: cuenta las filas insertadas por exec_driver_sql."""
+
+    def __init__(self):
+        self.rows = 0
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def begin(self):
+        yield _FakeConnection(self)
+
+
+def test_failing_flush_does_not_stop_other_inserters():
+    raised = threading.Event()
+    flushed = threading.Event()
+
+    broken = BatchInserter(_FakeEngine(), flush_interval=0.05)
+
+    def raise_on_flush():
+        raised.set()
+        raise RuntimeError("boom")
+
+    broken._do_flush = raise_on_flush
+
+    engine = _FakeEngine()
+    healthy = BatchInserter(
+        engine, flush_interval=0.05, on_flush_callback=lambda n: flushed.set()
+    )
+
+    broken.start()
+    healthy.start()
+    try:
+        # El flush de broken corrió y lanzó en el thread compartido...
+        assert raised.wait(2.0)
+        # ...y ese mismo thread sigue flusheando a los demás inserters
+        healthy.add(2, 2.0)
+        assert flushed.wait(2.0)
+        assert engine.rows == 1
+    finally:
+        broken.stop(flush_remaining=False)
+        healthy.stop(flush_remaining=False)
+
+
+def test_parallel_flush_survives_stop_and_restart():
+    engine = _FakeEngine()
+    inserter = BatchInserter(
+        engine, buffer_size=1000, flush_interval=60.0, max_batch_size=1000, flush_workers=2
+    )
+
+    inserter.start()
+    inserter.stop()
+    inserter.start()
+    # 600 filas > 500 por sentencia: el flush final va por el executor
+    for i in range(600):
+        inserter.add(i, float(i))
+    inserter.stop()
+
+    assert engine.rows == 600
+    assert inserter.get_stats()["pending"] == 0
+
+
+class _FailOnceEngine(_FakeEngine):
+    """El primer begin() se bloquea hasta release y luego falla."""
+
+    def __init__(self):
+        super().__init__()
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self._failed = False
+
+    @contextmanager
+    def begin(self):
+        if not self._failed:
+            self._failed = True
+            self.entered.set()
+            self.release.wait(5.0)
+            raise RuntimeError("db down")
+        yield _FakeConnection(self)
+
+
+def test_stop_waits_for_in_flight_flush_and_drains_its_retries():
+    engine = _FailOnceEngine()
+    inserter = BatchInserter(engine, flush_interval=0.01)
+    inserter.start()
+    for i in range(5):
+        inserter.add(i, float(i))
+
+    # Flush programado en curso (y a punto de fallar)
+    assert engine.entered.wait(2.0)
+    stopper = threading.Thread(target=inserter.stop)
+    stopper.start()
+    stopper.join(0.2)
+    assert stopper.is_alive()  # stop() espera al flush en curso
+
+    engine.release.set()
+    stopper.join(2.0)
+    assert not stopper.is_alive()
+    # Lo que el flush fallido reencoló lo escribe el flush final de stop()
+    assert engine.rows == 5
+    assert inserter.get_stats()["pending"] == 0